@@ -1,9 +1,9 @@
 import streamlit as st
-from datetime import date, datetime
+from datetime import date
 import pandas as pd
 import altair as alt
-import gspread
-from google.oauth2.service_account import Credentials
+from tendances import courbes_suivi
+from graphique import reduire_series
 
 # =========================
 # Connexion Google Sheets
@@ -15,16 +15,29 @@ def get_gs_client():
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
     ]
+    # gspread / google-auth (~0,5 s d'import) : chargés au premier accès aux données
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
     return gspread.authorize(creds)
 
-def get_worksheets():
+# classeur et onglets gardés pour le process : plus d'open_by_key à chaque rerun
+@st.cache_resource
+def get_spreadsheet():
     gc = get_gs_client()
-    sh = gc.open_by_key(st.secrets["app"]["spreadsheet_id"])
+    return gc.open_by_key(st.secrets["app"]["spreadsheet_id"])
+
+@st.cache_resource
+def get_worksheets_cached():
+    sh = get_spreadsheet()
     ws_profil = sh.worksheet("profil")
     ws_poids = sh.worksheet("poids")
     return ws_profil, ws_poids
 
+def get_worksheets():
+    return get_worksheets_cached()
+
 # =========================
 # Fonctions Profil
 # =========================
@@ -114,14 +127,6 @@ def facteur_activite(niveau):
         "Très élevé": 1.9
     }[niveau]
 
-def moyenne_glissante(values, window=7):
-    out = []
-    for i in range(len(values)):
-        start = max(0, i - window + 1)
-        chunk = values[start:i+1]
-        out.append(sum(chunk) / len(chunk))
-    return out
-
 # =========================
 # UI
 # =========================
@@ -243,16 +248,12 @@ with tab_suivi:
     if df.empty:
         st.info("Ajoute une première mesure pour afficher le graphe.")
     else:
-        # semaines depuis 1ère mesure
-        dates_dt = [datetime.fromisoformat(x) for x in df["date"].astype(str).tolist()]
-        t0 = dates_dt[0]
-        semaines_reel = [((dt - t0).days / 7.0) for dt in dates_dt]
-
-        poids_vals = df["poids"].tolist()
-        ma7 = moyenne_glissante(poids_vals, window=7)
-
-        df_reel = pd.DataFrame({"semaine": semaines_reel, "poids": poids_vals, "serie": "Réel"})
-        df_ma7 = pd.DataFrame({"semaine": semaines_reel, "poids": ma7, "serie": "Moyenne 7 jours"})
+        # Réel + moyenne sur 7 jours calendaires (trous interpolés), axe en semaines
+        df_suivi = courbes_suivi(df["date"].astype(str).to_numpy(), df["poids"].to_numpy(), jours=7)
+        df_reel = df_suivi[df_suivi["serie"] == "Réel"]
+        df_ma7 = df_suivi[df_suivi["serie"] == "Moyenne 7 jours"]
+        poids_vals = df_reel["poids"].tolist()
+        ma7 = df_ma7["poids"].tolist()  # un point par jour calendaire
 
         # projection (si plan déjà calculé)
         df_proj = pd.DataFrame(columns=["semaine", "poids", "serie"])
@@ -269,6 +270,7 @@ with tab_suivi:
                 df_proj = pd.DataFrame({"semaine": semaines, "poids": poids_proj, "serie": "Projection"})
 
         df_all = pd.concat([df_proj, df_reel, df_ma7], ignore_index=True)
+        df_all = reduire_series(df_all)
 
         st.markdown("### 📈 Réel vs Projection (axe semaines)")
 
@@ -1,9 +1,11 @@
 import streamlit as st
-from datetime import date, datetime
+from datetime import date
 import pandas as pd
-import altair as alt
-import gspread
-from google.oauth2.service_account import Credentials
+from stockage import feuille_poids_ecrire, feuille_poids_lire, feuille_profil_ecrire, feuille_profil_lire
+from tendances import courbes_suivi
+from graphique import reduire_series
+import partitions
+import traces
 
 # =========================
 # Secrets check
@@ -18,6 +20,21 @@ if (
     st.error("Secrets manquants : ajoute [gcp_service_account] et [app].spreadsheet_id dans Streamlit → Secrets.")
     st.stop()
 
+# Page d'admin cachée : ?admin=<app.admin_jeton>
+jeton = st.secrets["app"].get("admin_jeton")
+if jeton and st.query_params.get("admin") == jeton:
+    traces.page_admin()
+    st.stop()
+
+# export périodique des traces (une fois par process), pour un collecteur
+# Prometheus (textfile) ou en JSON
+@st.cache_resource
+def demarrer_export_traces():
+    if st.secrets["app"].get("traces_fichier"):
+        traces.demarrer_export(st.secrets["app"]["traces_fichier"])
+
+demarrer_export_traces()
+
 # =========================
 # Google Sheets (cache)
 # =========================
@@ -28,23 +45,40 @@ def get_gs_client():
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
     ]
+    # gspread / google-auth (~0,5 s d'import) : chargés au premier accès aux données
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
     return gspread.authorize(creds)
 
 @st.cache_resource
-def get_spreadsheet():
+def get_spreadsheet(spreadsheet_id: str):
     gc = get_gs_client()
-    return gc.open_by_key(st.secrets["app"]["spreadsheet_id"])
+    return gc.open_by_key(spreadsheet_id)
+
+# Utilisateurs répartis sur plusieurs classeurs ([app.shards], optionnel) :
+# table de routage lue une fois par process, relue toutes les 10 min
+@st.cache_resource(ttl=600)
+def get_routage():
+    classeurs = partitions.classeurs_config(st.secrets["app"])
+    exceptions = {}
+    if len(classeurs) > 1:
+        exceptions = partitions.lire_exceptions(get_spreadsheet(classeurs[partitions.PRINCIPAL]))
+    return partitions.Routage(classeurs, exceptions)
 
 @st.cache_resource
-def get_worksheets_cached():
-    sh = get_spreadsheet()
-    ws_profil = sh.worksheet("profil")
-    ws_poids = sh.worksheet("poids")
+def get_worksheets_cached(shard: str):
+    sh = get_spreadsheet(get_routage().classeurs[shard])
+    # chaque appel gspread est mesuré (latence, octets, lignes lues)
+    ws_profil = traces.FeuilleTracee(sh.worksheet("profil"))
+    ws_poids = traces.FeuilleTracee(sh.worksheet("poids"))
     return ws_profil, ws_poids
 
-def get_worksheets():
-    return get_worksheets_cached()
+@traces.tracer("get_worksheets")
+def get_worksheets(user_id: str):
+    # feuilles du shard de l'utilisateur : une lecture complète ne parcourt que ce shard
+    return get_worksheets_cached(get_routage().shard(user_id))
 
 # =========================
 # Defaults profil
@@ -85,31 +119,15 @@ def pAs_from_sport(intensite: str, heures_par_semaine: float) -> float:
     }[intensite]
     return coeff * heures_par_semaine
 
-def moyenne_glissante(values, window=7):
-    out = []
-    for i in range(len(values)):
-        start = max(0, i - window + 1)
-        chunk = values[start:i + 1]
-        out.append(sum(chunk) / len(chunk))
-    return out
-
 # =========================
 # PROFIL (multi-user)
 # profil sheet headers: user_id | key | value
 # =========================
 @st.cache_data(ttl=60)
 def profil_lire_user_cached(user_id: str) -> dict:
-    ws_profil, _ = get_worksheets()
-    rows = ws_profil.get_all_values()
-    if not rows:
-        return DEFAULT_PROFIL.copy()
-
-    # Expect headers
-    # rows[0] = ["user_id","key","value"]
-    data = {}
-    for r in rows[1:]:
-        if len(r) >= 3 and r[0] == user_id:
-            data[r[1]] = r[2]
+    traces.cache_manque("profil_lire_user")
+    ws_profil, _ = get_worksheets(user_id)
+    data = feuille_profil_lire(ws_profil, user_id)
 
     # fill defaults
     for k, v in DEFAULT_PROFIL.items():
@@ -117,32 +135,12 @@ def profil_lire_user_cached(user_id: str) -> dict:
     return data
 
 def profil_lire_user(user_id: str) -> dict:
+    traces.cache_appel("profil_lire_user")
     return profil_lire_user_cached(user_id)
 
 def profil_upsert_user(user_id: str, data: dict):
-    ws_profil, _ = get_worksheets()
-    rows = ws_profil.get_all_values()
-
-    # Ensure header
-    if len(rows) == 0:
-        ws_profil.append_row(["user_id", "key", "value"])
-        rows = ws_profil.get_all_values()
-
-    # Build index map (user_id,key) -> row number in sheet (1-based)
-    index = {}
-    for i, r in enumerate(rows[1:], start=2):
-        if len(r) >= 3:
-            index[(r[0], r[1])] = i
-
-    # Upsert each key (few keys => acceptable)
-    for k, v in data.items():
-        key = (user_id, k)
-        if key in index:
-            rownum = index[key]
-            ws_profil.update(f"C{rownum}", str(v))
-        else:
-            ws_profil.append_row([user_id, k, str(v)])
-
+    ws_profil, _ = get_worksheets(user_id)
+    feuille_profil_ecrire(ws_profil, user_id, data)
     profil_lire_user_cached.clear()
 
 # =========================
@@ -151,41 +149,17 @@ def profil_upsert_user(user_id: str, data: dict):
 # =========================
 @st.cache_data(ttl=30)
 def poids_lire_user_df_cached(user_id: str) -> pd.DataFrame:
-    _, ws_poids = get_worksheets()
-    rows = ws_poids.get_all_values()
-    if len(rows) <= 1:
-        return pd.DataFrame(columns=["date", "poids"])
-
-    df = pd.DataFrame(rows[1:], columns=rows[0])
-    # Filter user
-    df = df[df["user_id"] == user_id].copy()
-    if df.empty:
-        return pd.DataFrame(columns=["date", "poids"])
-
-    df["poids"] = pd.to_numeric(df["poids"], errors="coerce")
-    df = df.dropna(subset=["poids"]).sort_values("date")
-    return df[["date", "poids"]]
+    traces.cache_manque("poids_lire_user_df")
+    _, ws_poids = get_worksheets(user_id)
+    return pd.DataFrame(feuille_poids_lire(ws_poids, user_id), columns=["date", "poids"])
 
 def poids_lire_user_df(user_id: str) -> pd.DataFrame:
+    traces.cache_appel("poids_lire_user_df")
     return poids_lire_user_df_cached(user_id)
 
 def poids_ajouter_ou_maj_user(user_id: str, date_iso: str, poids: float):
-    _, ws_poids = get_worksheets()
-    rows = ws_poids.get_all_values()
-
-    # Ensure header
-    if len(rows) == 0:
-        ws_poids.append_row(["user_id", "date", "poids"])
-        rows = ws_poids.get_all_values()
-
-    # Search existing row for (user_id, date)
-    for idx, r in enumerate(rows[1:], start=2):
-        if len(r) >= 3 and r[0] == user_id and r[1] == date_iso:
-            ws_poids.update(f"C{idx}", str(poids))
-            poids_lire_user_df_cached.clear()
-            return
-
-    ws_poids.append_row([user_id, date_iso, str(poids)])
+    _, ws_poids = get_worksheets(user_id)
+    feuille_poids_ecrire(ws_poids, user_id, date_iso, poids)
     poids_lire_user_df_cached.clear()
 
 # =========================
@@ -369,16 +343,12 @@ with tab_suivi:
         st.info("Ajoute une première mesure pour afficher le graphe.")
         st.stop()
 
-    # Weeks since first measurement
-    dates_dt = [datetime.fromisoformat(x) for x in df["date"].astype(str).tolist()]
-    t0 = dates_dt[0]
-    semaines_reel = [((dt - t0).days / 7.0) for dt in dates_dt]
-
-    poids_vals = df["poids"].tolist()
-    ma7 = moyenne_glissante(poids_vals, window=7)
-
-    df_reel = pd.DataFrame({"semaine": semaines_reel, "poids": poids_vals, "serie": "Réel"})
-    df_ma7 = pd.DataFrame({"semaine": semaines_reel, "poids": ma7, "serie": "Moyenne 7 jours"})
+    # Réel + moyenne sur 7 jours calendaires (trous interpolés), axe en semaines
+    df_suivi = courbes_suivi(df["date"].astype(str).to_numpy(), df["poids"].to_numpy(), jours=7)
+    df_reel = df_suivi[df_suivi["serie"] == "Réel"]
+    df_ma7 = df_suivi[df_suivi["serie"] == "Moyenne 7 jours"]
+    poids_vals = df_reel["poids"].tolist()
+    ma7 = df_ma7["poids"].tolist()  # un point par jour calendaire
 
     # Projection from plan (if computed this session)
     df_proj = pd.DataFrame(columns=["semaine", "poids", "serie"])
@@ -395,8 +365,10 @@ with tab_suivi:
             df_proj = pd.DataFrame({"semaine": semaines, "poids": poids_proj, "serie": "Projection"})
 
     df_all = pd.concat([df_proj, df_reel, df_ma7], ignore_index=True)
+    df_all = reduire_series(df_all)
 
     st.markdown("### 📈 Réel vs Projection (axe semaines)")
+    import altair as alt  # pas chargé avant la saisie du user_id (st.line_chart du Plan le charge aussi)
     base = alt.Chart(df_all).encode(
         x=alt.X("semaine:Q", title="Semaines depuis la 1ère mesure"),
         y=alt.Y("poids:Q", title="Poids (kg)")
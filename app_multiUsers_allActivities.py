@@ -1,9 +1,18 @@
+import os
+import time
 import streamlit as st
-from datetime import date, datetime
+from datetime import date
 import pandas as pd
-import altair as alt
-import gspread
-from google.oauth2.service_account import Credentials
+from stockage import CacheUtilisateurs, StockageLocal
+from projection import projection_adaptative, projection_lineaire
+from tendances import courbes_suivi
+from graphique import PERIODES, plage_periode, reduire_series
+from historique import Historique
+import importation
+import partitions
+import traces
+
+DEBUT_RERUN = time.perf_counter()
 
 # =========================
 # Secrets check
@@ -18,6 +27,12 @@ if (
     st.error("Secrets manquants : ajoute [gcp_service_account] et [app].spreadsheet_id dans Streamlit → Secrets.")
     st.stop()
 
+# Page d'admin cachée : ?admin=<app.admin_jeton>
+jeton = st.secrets["app"].get("admin_jeton")
+if jeton and st.query_params.get("admin") == jeton:
+    traces.page_admin()
+    st.stop()
+
 # =========================
 # Google Sheets (cache)
 # =========================
@@ -28,39 +43,92 @@ def get_gs_client():
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
     ]
+    # gspread / google-auth (~0,5 s d'import) : chargés au premier accès aux données
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
     return gspread.authorize(creds)
 
 @st.cache_resource
-def get_spreadsheet():
+def get_spreadsheet(spreadsheet_id: str):
     gc = get_gs_client()
-    return gc.open_by_key(st.secrets["app"]["spreadsheet_id"])
+    return gc.open_by_key(spreadsheet_id)
+
+# Utilisateurs répartis sur plusieurs classeurs ([app.shards], optionnel) :
+# table de routage lue une fois par process, relue toutes les 10 min
+@st.cache_resource(ttl=600)
+def get_routage():
+    classeurs = partitions.classeurs_config(st.secrets["app"])
+    exceptions = {}
+    if len(classeurs) > 1:
+        exceptions = partitions.lire_exceptions(get_spreadsheet(classeurs[partitions.PRINCIPAL]))
+    return partitions.Routage(classeurs, exceptions)
 
 @st.cache_resource
-def get_worksheets_cached():
-    sh = get_spreadsheet()
-    ws_profil = sh.worksheet("profil")
-    ws_poids = sh.worksheet("poids")
+def get_worksheets_cached(shard: str):
+    sh = get_spreadsheet(get_routage().classeurs[shard])
+    # chaque appel gspread est mesuré (latence, octets, lignes lues)
+    ws_profil = traces.FeuilleTracee(sh.worksheet("profil"))
+    ws_poids = traces.FeuilleTracee(sh.worksheet("poids"))
     return ws_profil, ws_poids
 
-def get_worksheets():
-    return get_worksheets_cached()
+@traces.tracer("get_worksheets")
+def get_worksheets(shard: str):
+    return get_worksheets_cached(shard)
+
+def _par_shard(chemin, shard):
+    # perte_poids.sqlite3 -> perte_poids.s1.sqlite3 (le principal garde le nom d'origine)
+    if chemin is None or chemin == ":memory:" or shard == partitions.PRINCIPAL:
+        return chemin
+    racine, extension = os.path.splitext(chemin)
+    return f"{racine}.{shard}{extension}"
+
+# Copie locale (SQLite) : les lectures ne touchent plus le Sheet,
+# qui reste le miroir durable alimenté en arrière-plan. Une copie par
+# shard et par process, resynchronisée en tâche de fond (lignes ajoutées
+# seulement) pour toutes les sessions.
+@st.cache_resource
+def get_stockages():
+    chemin = st.secrets["app"].get("stockage_local", "perte_poids.sqlite3")
+    # journal des écritures (fsync) : une sauvegarde ne dépend pas du Sheet,
+    # recopiée dès qu'il répond, même après un redémarrage
+    journal = st.secrets["app"].get("journal", None if chemin == ":memory:" else chemin + ".journal")
+    stockages = {}
+    for shard in get_routage().classeurs:
+        stockage = StockageLocal(
+            lambda shard=shard: get_worksheets(shard),
+            chemin=_par_shard(chemin, shard), journal=_par_shard(journal, shard),
+        )
+        stockage.ouvrir()
+        stockage.demarrer_synchronisation()
+        source = "miroir" if shard == partitions.PRINCIPAL else f"miroir_{shard}"
+        traces.REGISTRE.sources[source] = stockage.miroir.metriques
+        stockages[shard] = stockage
+    # export périodique pour un collecteur Prometheus (textfile) ou en JSON
+    if st.secrets["app"].get("traces_fichier"):
+        traces.demarrer_export(st.secrets["app"]["traces_fichier"])
+    return stockages
+
+def get_stockage(user_id: str) -> StockageLocal:
+    return get_stockages()[get_routage().shard(user_id)]
 
 # =========================
 # Defaults profil
 # =========================
+# Valeurs typées (cf. PROFIL_COLONNES dans stockage.py)
 DEFAULT_PROFIL = {
-    "poids_actuel": "70.0",
-    "taille_cm": "165.0",
-    "age": "30",
+    "poids_actuel": 70.0,
+    "taille_cm": 165.0,
+    "age": 30,
     "sexe": "Femme",
-    "objectif": "62.0",
+    "objectif": 62.0,
     "mode_deficit": "Auto (20%)",
-    "deficit_perso": "500",
+    "deficit_perso": 500.0,
     "niveau_job": "Faible (1.5)",
-    "h_sport_faible": "0.0",
-    "h_sport_moyenne": "3.0",
-    "h_sport_forte": "0.0",
+    "h_sport_faible": 0.0,
+    "h_sport_moyenne": 3.0,
+    "h_sport_forte": 0.0,
 }
 
 # =========================
@@ -81,110 +149,101 @@ def pAb_from_job(niveau_job: str) -> float:
 def pAs_from_sport_hours(h_faible: float, h_moyenne: float, h_forte: float) -> float:
     return 0.02 * h_faible + 0.04 * h_moyenne + 0.06 * h_forte
 
-def moyenne_glissante(values, window=7):
-    out = []
-    for i in range(len(values)):
-        start = max(0, i - window + 1)
-        chunk = values[start:i + 1]
-        out.append(sum(chunk) / len(chunk))
-    return out
-
 # =========================
 # PROFIL (multi-user)
-# profil sheet headers: user_id | key | value
+# profil sheet headers: user_id | poids_actuel | taille_cm | ... (1 ligne / user)
 # =========================
-@st.cache_data(ttl=60)
-def profil_lire_user_cached(user_id: str) -> dict:
-    ws_profil, _ = get_worksheets()
-    rows = ws_profil.get_all_values()
-    if not rows:
-        return DEFAULT_PROFIL.copy()
-
-    # Expect headers
-    # rows[0] = ["user_id","key","value"]
-    data = {}
-    for r in rows[1:]:
-        if len(r) >= 3 and r[0] == user_id:
-            data[r[1]] = r[2]
+def _profil_charger(user_id: str) -> dict:
+    data = get_stockage(user_id).profil_lire(user_id)
 
     # fill defaults
     for k, v in DEFAULT_PROFIL.items():
         data.setdefault(k, v)
     return data
 
+# Caches par user_id partagés entre sessions : une sauvegarde ne vide
+# que l'entrée de l'utilisateur concerné (au lieu de .clear() global).
+@st.cache_resource
+def get_cache_profil():
+    cache = CacheUtilisateurs(_profil_charger, taille_max=500)
+    for stockage in get_stockages().values():
+        stockage.abonner(cache.rafraichir)
+    traces.REGISTRE.sources["cache_profil"] = cache.stats
+    return cache
+
 def profil_lire_user(user_id: str) -> dict:
-    return profil_lire_user_cached(user_id)
+    return get_cache_profil().lire(user_id)
 
 def profil_upsert_user(user_id: str, data: dict):
-    ws_profil, _ = get_worksheets()
-    rows = ws_profil.get_all_values()
+    valeurs = get_stockage(user_id).profil_ecrire(user_id, data)
+    get_cache_profil().modifier(user_id, lambda profil: {**profil, **valeurs})
 
-    # Header si absent
-    if len(rows) == 0:
-        ws_profil.append_row(["user_id", "key", "value"])
-        rows = ws_profil.get_all_values()
 
-    # Supprimer toutes les anciennes lignes de CE user
-    nouvelles_lignes = [["user_id", "key", "value"]]
-    for r in rows[1:]:
-        if len(r) < 3:
-            continue
-        if r[0] != user_id:
-            nouvelles_lignes.append(r)
+# =========================
+# POIDS (multi-user)
+# poids sheet headers: user_id | date | poids
+# =========================
+def _poids_charger(user_id: str) -> Historique:
+    # converti une seule fois (datetime64[D] / float32, trié), puis partagé
+    return Historique.depuis_lignes(get_stockage(user_id).poids_lire(user_id))
+
+@st.cache_resource
+def get_cache_poids():
+    cache = CacheUtilisateurs(_poids_charger, taille_max=500)
+    for stockage in get_stockages().values():
+        stockage.abonner(cache.rafraichir)
+    traces.REGISTRE.sources["cache_poids"] = cache.stats
+    return cache
 
-    # Ajouter les nouvelles valeurs du profil
-    for k, v in data.items():
-        nouvelles_lignes.append([user_id, k, str(v)])
+def poids_lire_user(user_id: str) -> Historique:
+    return get_cache_poids().lire(user_id)
 
-    # ⚠️ UN SEUL APPEL API
-    ws_profil.clear()
-    ws_profil.update(nouvelles_lignes)
+def poids_resume_user(user_id: str):
+    # dernier/premier poids, moyenne 7 jours... (table resume, 1 ligne)
+    return get_stockage(user_id).resume_lire(user_id)
+
+def poids_ajouter_ou_maj_user(user_id: str, date_iso: str, poids: float):
+    get_stockage(user_id).poids_ecrire(user_id, date_iso, poids)
+    get_cache_poids().modifier(user_id, lambda hist: hist.avec(date_iso, float(poids)))
 
-    profil_lire_user_cached.clear()
+def poids_importer_user(user_id: str, mesures: pd.DataFrame) -> dict:
+    # upsert vectorisé, 1 transaction locale, 1 lot vers le Sheet
+    nouveau, lignes, stats = importation.fusionner(poids_lire_user(user_id), mesures)
+    get_stockage(user_id).poids_ecrire_lot(user_id, lignes)
+    get_cache_poids().modifier(user_id, lambda hist: nouveau)
+    return stats
 
+def poids_exporter_user(user_id: str):
+    # lu seulement au clic ; Streamlit garde alors le fichier entier en
+    # mémoire pour le servir (seul `importation.py exporter` écrit en flux)
+    return importation.FluxOctets(importation.flux_csv(get_stockage(user_id).poids_iterer(user_id)))
 
 # =========================
-# POIDS (multi-user)
-# poids sheet headers: user_id | date | poids
+# Statut de la sauvegarde (miroir Sheets en arrière-plan)
 # =========================
-@st.cache_data(ttl=30)
-def poids_lire_user_df_cached(user_id: str) -> pd.DataFrame:
-    _, ws_poids = get_worksheets()
-    rows = ws_poids.get_all_values()
-    if len(rows) <= 1:
-        return pd.DataFrame(columns=["date", "poids"])
-
-    df = pd.DataFrame(rows[1:], columns=rows[0])
-    # Filter user
-    df = df[df["user_id"] == user_id].copy()
-    if df.empty:
-        return pd.DataFrame(columns=["date", "poids"])
-
-    df["poids"] = pd.to_numeric(df["poids"], errors="coerce")
-    df = df.dropna(subset=["poids"]).sort_values("date")
-    return df[["date", "poids"]]
-
-def poids_lire_user_df(user_id: str) -> pd.DataFrame:
-    return poids_lire_user_df_cached(user_id)
-
-def poids_ajouter_ou_maj_user(user_id: str, date_iso: str, poids: float):
-    _, ws_poids = get_worksheets()
-    rows = ws_poids.get_all_values()
+STATUTS = {
+    "en_attente": "⏳ Envoi vers Google Sheets en cours…",
+    "hors_ligne": "📴 Google Sheets ne répond pas : mesure gardée localement, envoi dès que possible.",
+    "echec": "⚠️ Envoi vers Google Sheets échoué (données gardées localement).",
+    "ok": "☁️ Enregistré dans Google Sheets",
+}
 
-    # Ensure header
-    if len(rows) == 0:
-        ws_poids.append_row(["user_id", "date", "poids"])
-        rows = ws_poids.get_all_values()
+# secondes entre deux rafraîchissements du statut ; absent = pas de rafraîchissement
+CADENCES = {"en_attente": 2, "hors_ligne": 30}
 
-    # Search existing row for (user_id, date)
-    for idx, r in enumerate(rows[1:], start=2):
-        if len(r) >= 3 and r[0] == user_id and r[1] == date_iso:
-            ws_poids.update(f"C{idx}", str(poids))
-            poids_lire_user_df_cached.clear()
-            return
+def statut_sauvegarde(user_id: str, run_every):
+    etat = get_stockage(user_id).miroir.etat(user_id)
+    st.caption(STATUTS[etat])
+    if CADENCES.get(etat) != run_every:
+        # run_every est figé à la création du fragment, et le navigateur ne
+        # coupe ses minuteries qu'à un rerun complet : un rerun scopé au
+        # fragment continuerait d'interroger toutes les 2 s après "ok".
+        st.rerun()
 
-    ws_poids.append_row([user_id, date_iso, str(poids)])
-    poids_lire_user_df_cached.clear()
+def afficher_statut(user_id: str):
+    # se rafraîchit seul tant qu'une écriture est en attente (hors ligne : plus lentement)
+    run_every = CADENCES.get(get_stockage(user_id).miroir.etat(user_id))
+    st.fragment(statut_sauvegarde, run_every=run_every)(user_id, run_every)
 
 # =========================
 # UI
@@ -203,25 +262,26 @@ if not user_id:
 
 st.session_state["user_id"] = user_id
 
-tab_plan, tab_suivi = st.tabs(["🧮 Plan", "📅 Suivi quotidien"])
-
 # Load profil for this user
 profil = profil_lire_user(user_id)
 
 # =========================
 # TAB PLAN
 # =========================
-with tab_plan:
+@st.fragment
+@traces.tracer("vue_plan")
+def vue_plan(user_id: str, profil: dict):
+    # fragment : un widget du plan ne relance que cette vue
     st.subheader("🧮 Plan (estimation)")
 
     col1, col2 = st.columns(2)
     with col1:
-        poids_actuel = st.number_input("Poids actuel (kg)", 20.0, 300.0, float(profil["poids_actuel"]), 0.1)
-        taille_cm = st.number_input("Taille (cm)", 120.0, 230.0, float(profil["taille_cm"]), 1.0)
-        age = st.number_input("Âge", 10, 120, int(float(profil["age"])), 1)
+        poids_actuel = st.number_input("Poids actuel (kg)", 20.0, 300.0, profil["poids_actuel"], 0.1)
+        taille_cm = st.number_input("Taille (cm)", 120.0, 230.0, profil["taille_cm"], 1.0)
+        age = st.number_input("Âge", 10, 120, profil["age"], 1)
     with col2:
         sexe = st.selectbox("Sexe", ["Femme", "Homme"], index=0 if profil["sexe"] == "Femme" else 1)
-        objectif = st.number_input("Poids objectif (kg)", 20.0, 300.0, float(profil["objectif"]), 0.1)
+        objectif = st.number_input("Poids objectif (kg)", 20.0, 300.0, profil["objectif"], 0.1)
 
     # ---- PAb + PAs (avec explications) ----
     st.markdown("## 🏃 Facteur d’activité (PA = PAb + PAs)")
@@ -229,7 +289,7 @@ with tab_plan:
 
     st.markdown("### 🧑‍💼 Activité professionnelle (PAb)")
     job_options = ["Très faible (1.4)", "Faible (1.5)", "Modéré (1.6)", "Important (1.7)"]
-    job_default = profil.get("niveau_job", "Faible (1.5)")
+    job_default = profil["niveau_job"]
     job_index = job_options.index(job_default) if job_default in job_options else 1
     niveau_job = st.selectbox("Choisis ton niveau au travail (hors sport)", job_options, index=job_index)
 
@@ -245,19 +305,19 @@ with tab_plan:
     st.markdown("### 🏃 Activité sportive (PAs)")
     st.caption("Entre tes heures par semaine pour chaque intensité. Exemple : 2h marche + 1h course.")
 
-    h_f_default = float(profil.get("h_sport_faible", "0.0") or 0.0)
-    h_m_default = float(profil.get("h_sport_moyenne", "0.0") or 0.0)
-    h_i_default = float(profil.get("h_sport_forte", "0.0") or 0.0)
+    h_f_default = profil["h_sport_faible"]
+    h_m_default = profil["h_sport_moyenne"]
+    h_i_default = profil["h_sport_forte"]
 
     colS1, colS2, colS3 = st.columns(3)
     with colS1:
-        h_faible = st.number_input("Heures faibles", 0.0, 40.0, float(h_f_default), 0.5,
+        h_faible = st.number_input("Heures faibles", 0.0, 40.0, h_f_default, 0.5,
                                help="Ex: yoga, stretching, marche lente")
     with colS2:
-        h_moyenne = st.number_input("Heures moyennes", 0.0, 40.0, float(h_m_default), 0.5,
+        h_moyenne = st.number_input("Heures moyennes", 0.0, 40.0, h_m_default, 0.5,
                                 help="Ex: marche rapide, vélo, natation tranquille")
     with colS3:
-        h_forte = st.number_input("Heures fortes", 0.0, 40.0, float(h_i_default), 0.5,
+        h_forte = st.number_input("Heures fortes", 0.0, 40.0, h_i_default, 0.5,
                               help="Ex: course, HIIT, cross-training, squash")
 
     heures_total = h_faible + h_moyenne + h_forte
@@ -284,14 +344,14 @@ with tab_plan:
     mode_opts = ["Auto (20%)", "Personnalisé"]
     mode_deficit = st.radio(
         "Choix", mode_opts, horizontal=True,
-        index=0 if profil.get("mode_deficit", "Auto (20%)") == "Auto (20%)" else 1
+        index=0 if profil["mode_deficit"] == "Auto (20%)" else 1
     )
 
     if mode_deficit == "Auto (20%)":
         deficit = max(300.0, min(0.20 * tdee, 800.0))
-        deficit_perso = float(profil.get("deficit_perso", "500"))
+        deficit_perso = profil["deficit_perso"]
     else:
-        deficit_perso = float(st.slider("Déficit (kcal/j)", 200, 1000, int(float(profil.get("deficit_perso", "500"))), 50))
+        deficit_perso = float(st.slider("Déficit (kcal/j)", 200, 1000, int(profil["deficit_perso"]), 50))
         deficit = deficit_perso
 
     calories_cible = tdee - deficit
@@ -343,7 +403,7 @@ with tab_plan:
 
         profil_upsert_user(user_id, nouveau)
         st.success("Profil sauvegardé ✅")
-        st.rerun()
+    afficher_statut(user_id)
 
 
     # ---- Projection ----
@@ -353,28 +413,47 @@ with tab_plan:
     elif deficit_reel <= 0:
         st.info("Déficit nul : augmente le déficit ou baisse la cible.")
     else:
-        perte_par_semaine = (deficit_reel * 7) / 7700.0
-        semaines_est = perte_totale / max(perte_par_semaine, 1e-6)
-        max_semaines = int(min(104, max(4, semaines_est + 2)))
-        semaines = list(range(0, max_semaines + 1))
-        poids_proj = [max(objectif, poids_actuel - perte_par_semaine * w) for w in semaines]
-        st.line_chart(pd.DataFrame({"Projection": poids_proj}, index=semaines))
+        # même calcul (mis en cache) que la projection de l'onglet Suivi
+        semaines, poids_proj, semaines_est = projection_lineaire(poids_actuel, objectif, deficit_reel)
+        # TDEE recalculé chaque jour avec le poids projeté (apport = cible)
+        semaines_ad, poids_ad, semaines_est_ad = projection_adaptative(
+            poids_actuel, objectif, taille_cm, age, sexe, PA, calories_cible
+        )
+        df_plan = pd.concat([
+            pd.DataFrame({"semaine": semaines, "poids": poids_proj, "serie": "Projection"}),
+            pd.DataFrame({"semaine": semaines_ad, "poids": poids_ad, "serie": "Projection (TDEE adaptatif)"}),
+        ], ignore_index=True)
+        # spec Vega-Lite brute : st.line_chart importerait Altair dès le
+        # premier rerun avec données, onglet Suivi fermé
+        st.vega_lite_chart(df_plan, {
+            "mark": "line",
+            "encoding": {
+                "x": {"field": "semaine", "type": "quantitative", "title": "Semaines"},
+                "y": {"field": "poids", "type": "quantitative", "title": "Poids (kg)"},
+                "color": {"field": "serie", "type": "nominal", "title": None},
+            },
+        }, use_container_width=True)
         st.success(f"Durée estimée ≈ **{semaines_est:.1f} semaines**")
+        if semaines_est_ad == float("inf"):
+            st.info("Avec le TDEE qui baisse en même temps que le poids, l'objectif n'est pas atteint à cette cible calorique.")
+        else:
+            st.caption(f"Avec un TDEE qui baisse en même temps que le poids : ≈ {semaines_est_ad:.1f} semaines.")
 
 # =========================
 # TAB SUIVI
 # =========================
-
-with tab_suivi:
+@st.fragment
+@traces.tracer("vue_suivi")
+def vue_suivi(user_id: str, profil: dict):
     st.subheader("📅 Suivi quotidien")
 
-    df = poids_lire_user_df(user_id)
+    resume = poids_resume_user(user_id)
 
     colA, colB, colC = st.columns([1.2, 1.2, 1])
     with colA:
         d = st.date_input("Date", value=date.today())
     with colB:
-        last = float(df["poids"].iloc[-1]) if len(df) else float(profil.get("poids_actuel", "70.0"))
+        last = resume["dernier_poids"] if resume else profil["poids_actuel"]
         poids_jour = st.number_input("Poids du jour (kg)", 20.0, 300.0, last, 0.1)
     with colC:
         st.write("")
@@ -382,24 +461,49 @@ with tab_suivi:
         if st.button("💾 Enregistrer la mesure"):
             poids_ajouter_ou_maj_user(user_id, d.isoformat(), float(poids_jour))
             st.success("Mesure enregistrée ✅")
-            df = poids_lire_user_df(user_id)
+            resume = poids_resume_user(user_id)
+    afficher_statut(user_id)
+
+    with st.expander("📥 Importer / 📤 Exporter l'historique"):
+        fichier = st.file_uploader(
+            "Fichier CSV ou Parquet (export de balance, tableur…)", type=["csv", "txt", "parquet"],
+            key=f"import_{user_id}",
+        )
+        if fichier is not None:
+            ordre = st.radio("Dates ambiguës (03/04/2026)", ["jour/mois", "mois/jour"], horizontal=True,
+                             key=f"import_ordre_{user_id}")
+            try:
+                mesures, rejets = importation.valider(importation.lire_fichier(fichier), ordre == "jour/mois")
+            except ValueError as e:
+                st.error(f"Fichier illisible : {e}")
+            else:
+                st.caption(f"{len(mesures)} mesures valides, {len(rejets)} lignes rejetées.")
+                if len(rejets):
+                    st.dataframe(rejets, use_container_width=True, hide_index=True)
+                if len(mesures) and st.button(f"Importer {len(mesures)} mesures"):
+                    stats = poids_importer_user(user_id, mesures)
+                    st.success(
+                        f"Import terminé ✅ {stats['ajouts']} ajoutées, "
+                        f"{stats['modifications']} modifiées, {stats['inchangees']} inchangées."
+                    )
+                    resume = poids_resume_user(user_id)
+        st.download_button(
+            "📤 Exporter (CSV)", lambda: poids_exporter_user(user_id),
+            file_name=f"poids_{user_id}.csv", mime="text/csv", on_click="ignore",
+        )
 
     st.divider()
 
-    if df.empty:
+    if resume is None:
         st.info("Ajoute une première mesure pour afficher le graphe.")
-        st.stop()
-
-    # Weeks since first measurement
-    dates_dt = [datetime.fromisoformat(x) for x in df["date"].astype(str).tolist()]
-    t0 = dates_dt[0]
-    semaines_reel = [((dt - t0).days / 7.0) for dt in dates_dt]
+        return
 
-    poids_vals = df["poids"].tolist()
-    ma7 = moyenne_glissante(poids_vals, window=7)
+    hist = poids_lire_user(user_id)
 
-    df_reel = pd.DataFrame({"semaine": semaines_reel, "poids": poids_vals, "serie": "Réel"})
-    df_ma7 = pd.DataFrame({"semaine": semaines_reel, "poids": ma7, "serie": "Moyenne 7 jours"})
+    # Réel + moyenne sur 7 jours calendaires (trous interpolés), axe en semaines
+    df_suivi = courbes_suivi(hist.jours, hist.poids, jours=7)
+    df_reel = df_suivi[df_suivi["serie"] == "Réel"]
+    df_ma7 = df_suivi[df_suivi["serie"] == "Moyenne 7 jours"]
 
     # Projection from plan (if computed this session)
     df_proj = pd.DataFrame(columns=["semaine", "poids", "serie"])
@@ -409,15 +513,17 @@ with tab_suivi:
 
     if poids_depart_plan is not None and objectif is not None and deficit_reel is not None:
         if (poids_depart_plan - objectif) > 0 and deficit_reel > 0:
-            perte_par_semaine = (deficit_reel * 7) / 7700.0
-            semaines_max = int(min(104, max(4, (poids_depart_plan - objectif) / max(perte_par_semaine, 1e-6) + 2)))
-            semaines = list(range(0, semaines_max + 1))
-            poids_proj = [max(objectif, poids_depart_plan - perte_par_semaine * w) for w in semaines]
+            semaines, poids_proj, _ = projection_lineaire(poids_depart_plan, objectif, deficit_reel)
             df_proj = pd.DataFrame({"semaine": semaines, "poids": poids_proj, "serie": "Projection"})
 
+    st.markdown("### 📈 Réel vs Projection (axe semaines)")
+    periode = st.radio("Période affichée", list(PERIODES), index=len(PERIODES) - 1, horizontal=True)
+
+    # seuls les points visibles partent au navigateur, plafonnés par série
     df_all = pd.concat([df_proj, df_reel, df_ma7], ignore_index=True)
+    df_all = reduire_series(df_all, plage=plage_periode(df_reel, periode))
 
-    st.markdown("### 📈 Réel vs Projection (axe semaines)")
+    import altair as alt  # chargé seulement à l'ouverture de l'onglet Suivi
     base = alt.Chart(df_all).encode(
         x=alt.X("semaine:Q", title="Semaines depuis la 1ère mesure"),
         y=alt.Y("poids:Q", title="Poids (kg)")
@@ -434,10 +540,33 @@ with tab_suivi:
     st.altair_chart((lignes + points).interactive(), use_container_width=True)
 
     st.markdown("### 📌 Indicateurs")
-    st.write(f"- **Dernier poids** : {poids_vals[-1]:.1f} kg")
-    st.write(f"- **Depuis le début** : {poids_vals[-1] - poids_vals[0]:+.1f} kg")
-    if len(ma7) >= 7:
-        st.write(f"- **Moyenne 7 jours actuelle** : {ma7[-1]:.1f} kg")
+    st.write(f"- **Dernier poids** : {resume['dernier_poids']:.1f} kg")
+    st.write(f"- **Depuis le début** : {resume['dernier_poids'] - resume['premier_poids']:+.1f} kg")
+    if resume["fenetre_complete"]:
+        # même valeur que la courbe (jours manquants interpolés)
+        st.write(f"- **Moyenne 7 jours actuelle** : {df_ma7['poids'].iloc[-1]:.1f} kg")
 
     st.markdown("### 📋 Historique (toi uniquement)")
-    st.dataframe(df, use_container_width=True)
+    st.dataframe(
+        hist.frame(), use_container_width=True,
+        column_config={
+            "date": st.column_config.DateColumn("date"),
+            "poids": st.column_config.NumberColumn("poids", format="%.1f"),
+        },
+    )
+
+
+# =========================
+# Onglets : seul l'onglet ouvert s'exécute (changement d'onglet = rerun)
+# =========================
+tab_plan, tab_suivi = st.tabs(["🧮 Plan", "📅 Suivi quotidien"], key="onglet", on_change="rerun")
+
+with tab_plan:
+    if tab_plan.open:
+        vue_plan(user_id, profil)
+
+with tab_suivi:
+    if tab_suivi.open:
+        vue_suivi(user_id, profil)
+
+traces.REGISTRE.observer("rerun", time.perf_counter() - DEBUT_RERUN)
@@ -0,0 +1,173 @@
+"""Benchmark headless d'un rerun Streamlit complet pour chaque app.
+
+    python bench_apps.py [--lignes 20000] [--utilisateurs 200] [--latence-ms 0]
+                         [--apps app.py ...] [--json resultats.json]
+
+Chaque app est pilotée par streamlit.testing.v1.AppTest, avec gspread
+remplacé par des FeuilleSimulee (bench_stockage) : aucun réseau. Pour les
+interactions courantes (démarrage, connexion, déplacement du curseur de
+déficit, enregistrement d'une pesée) on mesure :
+
+- le temps du rerun (ms)
+- les appels au Sheet pendant le rerun, et ceux faits ensuite en
+  arrière-plan (miroir de l'app principale)
+- la taille sérialisée des éléments envoyés au navigateur (total,
+  graphiques, tableaux)
+
+AppTest relance toujours le script entier : les fragments de l'app
+principale ne réduisent pas le temps mesuré ici, seulement en production.
+Le résultat est imprimé en JSON (ou écrit dans --json).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+RACINE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RACINE)
+
+import gspread  # noqa: E402
+import streamlit as st  # noqa: E402
+from google.oauth2 import service_account  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from bench_stockage import FeuilleSimulee, feuilles_synthetiques  # noqa: E402
+from stockage import ClasseurMemoire, MiroirFeuilles  # noqa: E402
+
+APPS = ["app.py", "app_multiUsers.py", "app_multiUsers_allActivities.py"]
+GRAPHIQUES = {"vega_lite_chart", "arrow_vega_lite_chart", "line_chart"}
+TABLEAUX = {"arrow_data_frame", "dataframe"}
+
+
+# =========================
+# Faux backend Sheets
+# =========================
+def classeur_synthetique(app, lignes, utilisateurs, latence, compteur):
+    users, _, poids, profil_large, profil_cv = feuilles_synthetiques(lignes, utilisateurs)
+    # app principale : une ligne par utilisateur ; les deux autres : clé / valeur
+    profil = profil_large if app == "app_multiUsers_allActivities.py" else profil_cv
+    if app == "app.py":
+        # une seule personne : key | value et date | poids
+        poids = [["date", "poids"]] + [r[1:] for r in poids[1:] if r[0] == users[0]]
+        profil = [["key", "value"]] + [r[1:] for r in profil_cv[1:] if r[0] == users[0]]
+    options = dict(latence=latence, compteur=compteur)
+    return users[0], ClasseurMemoire({
+        "profil": FeuilleSimulee(profil, titre="profil", **options),
+        "poids": FeuilleSimulee(poids, titre="poids", **options),
+    })
+
+
+def installer(classeur):
+    class Client:
+        def open_by_key(self, cle):
+            return classeur
+
+    gspread.authorize = lambda creds: Client()
+    service_account.Credentials.from_service_account_info = classmethod(lambda cls, info, scopes=None: object())
+
+
+# =========================
+# Mesures
+# =========================
+def _elements(noeud):
+    enfants = getattr(noeud, "children", None)
+    for enfant in (enfants.values() if isinstance(enfants, dict) else ()):
+        yield enfant
+        yield from _elements(enfant)
+
+
+def payload(at):
+    tailles = Counter()
+    for e in _elements(at._tree):
+        proto = getattr(e, "proto", None)
+        if proto is None or not hasattr(proto, "ByteSize"):
+            continue
+        n = proto.ByteSize()
+        tailles["total"] += n
+        if e.type in GRAPHIQUES:
+            tailles["graphiques"] += n
+        elif e.type in TABLEAUX:
+            tailles["tableaux"] += n
+    return {k: tailles[k] for k in ("total", "graphiques", "tableaux")}
+
+
+def etape(at, action, compteur):
+    avant = compteur["appels"]
+    t0 = time.perf_counter()
+    action()
+    ms = (time.perf_counter() - t0) * 1000.0
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return {"ms": ms, "appels": compteur["appels"] - avant, "octets": payload(at)}
+
+
+def scenario(app, user_id, at):
+    def connexion():
+        if at.text_input:
+            at.text_input[0].input(user_id).run()
+        else:
+            at.run()
+
+    def mode_perso():
+        [r for r in at.radio if r.label == "Choix"][0].set_value("Personnalisé").run()
+
+    def curseur():
+        [s for s in at.slider if s.label.startswith("Déficit")][0].set_value(700).run()
+
+    def mesure():
+        if app == "app_multiUsers_allActivities.py":
+            # onglets paresseux : AppTest ne renvoie pas l'onglet actif
+            at.session_state["onglet"] = "📅 Suivi quotidien"
+            at.run()
+            at.session_state["onglet"] = "📅 Suivi quotidien"
+        [b for b in at.button if "Enregistrer" in b.label][0].click().run()
+
+    return [("demarrage", at.run), ("connexion", connexion), ("mode_perso", mode_perso),
+            ("curseur", curseur), ("mesure", mesure)]
+
+
+def mesurer_app(app, args):
+    compteur = Counter()
+    user_id, classeur = classeur_synthetique(app, args.lignes, args.utilisateurs, args.latence_ms / 1000.0, compteur)
+    installer(classeur)
+    # même code de get_gs_client dans les trois apps : caches partagés, on repart à froid
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    at = AppTest.from_file(os.path.join(RACINE, app), default_timeout=120)
+    at.secrets["gcp_service_account"] = {"type": "service_account"}
+    at.secrets["app"] = {"spreadsheet_id": "bench", "stockage_local": ":memory:"}
+
+    resultat = {"app": app, "lignes": args.lignes, "utilisateurs": args.utilisateurs, "etapes": {}}
+    for nom, action in scenario(app, user_id, at):
+        resultat["etapes"][nom] = etape(at, action, compteur)
+    # écritures différées (miroir) : attendre la fenêtre de regroupement
+    time.sleep(MiroirFeuilles.fenetre + 0.5)
+    resultat["appels_total"] = compteur["appels"]
+    resultat["appels_par_methode"] = {k: v for k, v in compteur.items() if k not in ("appels", "lignes_lues")}
+    resultat["lignes_lues"] = compteur["lignes_lues"]
+    return resultat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lignes", type=int, default=20000)
+    parser.add_argument("--utilisateurs", type=int, default=200)
+    parser.add_argument("--latence-ms", type=float, default=0.0)
+    parser.add_argument("--apps", nargs="+", default=APPS)
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier au lieu de stdout")
+    args = parser.parse_args(argv)
+
+    MiroirFeuilles.fenetre = 0.1
+    resultats = [mesurer_app(app, args) for app in args.apps]
+    sortie = json.dumps(resultats, indent=2, ensure_ascii=False)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(sortie)
+    else:
+        print(sortie)
+
+
+if __name__ == "__main__":
+    main()
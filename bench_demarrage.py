@@ -0,0 +1,206 @@
+"""Benchmark du démarrage à froid de chaque app (un process neuf par mesure).
+
+    python bench_demarrage.py [--apps app.py ...] [--repetitions 3]
+                              [--lignes 2000] [--profil] [--json resultats.json]
+
+Pour chaque app, un process Python neuf lance le script avec AppTest, sur
+un faux Sheet (FeuilleMemoire) :
+
+- import_streamlit : ce que paie déjà le serveur avant toute session
+- premiere_peinture : premier rerun complet (titre + saisie du user_id)
+- donnees : premier rerun qui lit le Sheet (connexion)
+- suivi : premier affichage de l'onglet Suivi (graphe)
+
+Pour chaque étape : temps (ms) et modules lourds importés pendant l'étape.
+gspread et google-auth ne sont pas importés d'avance : le faux client est
+posé par un crochet d'import, au moment où l'app les charge. --profil
+imprime les 25 fonctions les plus coûteuses (cProfile) de chaque étape.
+Les médianes des répétitions sont imprimées en JSON (ou écrites dans --json).
+"""
+import argparse
+import importlib.abc
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RACINE)
+
+APPS = ["app.py", "app_multiUsers.py", "app_multiUsers_allActivities.py"]
+LOURDS = ["numpy", "pandas", "pyarrow", "altair", "gspread", "google.oauth2"]
+ONGLET_SUIVI = "📅 Suivi quotidien"
+
+
+# =========================
+# Faux backend, posé à l'import de gspread / google-auth
+# =========================
+class Crochet(importlib.abc.MetaPathFinder):
+    """Applique `rustines[nom](module)` juste après l'import réel du module."""
+
+    def __init__(self, rustines):
+        self.rustines = rustines
+
+    def find_spec(self, nom, path, target=None):
+        if nom not in self.rustines:
+            return None
+        sys.meta_path.remove(self)
+        try:
+            spec = importlib.util.find_spec(nom)
+        finally:
+            sys.meta_path.insert(0, self)
+        executer = spec.loader.exec_module
+
+        def exec_module(module):
+            executer(module)
+            self.rustines[nom](module)
+
+        spec.loader.exec_module = exec_module
+        return spec
+
+
+def classeur_synthetique(app, lignes):
+    # sans numpy / pandas : ils ne doivent être importés que par l'app
+    from stockage import ClasseurMemoire, FeuilleMemoire
+
+    jours = [f"2024-{m:02d}-{j:02d}" for m in range(1, 13) for j in range(1, 29)]
+    users = [f"u{u:03d}" for u in range(max(1, lignes // len(jours)))]
+    poids = [["user_id", "date", "poids"]]
+    poids += [[u, d, f"{80 - 0.02 * i:.1f}"] for i, d in enumerate(jours) for u in users][:lignes]
+    profil = [["user_id", "poids_actuel"]] + [[u, "80.0"] for u in users]
+    if app == "app.py":
+        poids = [["date", "poids"]] + [r[1:] for r in poids[1:] if r[0] == users[0]]
+        profil = [["key", "value"], ["poids_actuel", "80.0"]]
+    return users[0], ClasseurMemoire({
+        "profil": FeuilleMemoire(profil, titre="profil"),
+        "poids": FeuilleMemoire(poids, titre="poids"),
+    })
+
+
+def installer(classeur):
+    class Client:
+        def open_by_key(self, cle):
+            return classeur
+
+    def rustine_gspread(module):
+        module.authorize = lambda creds: Client()
+
+    def rustine_google(module):
+        module.Credentials.from_service_account_info = classmethod(lambda cls, info, scopes=None: object())
+
+    sys.meta_path.insert(0, Crochet({
+        "gspread": rustine_gspread,
+        "google.oauth2.service_account": rustine_google,
+    }))
+
+
+# =========================
+# Une app, dans ce process
+# =========================
+def _charges():
+    return {m for m in LOURDS if m in sys.modules}
+
+
+def etape(action, profil):
+    avant = _charges()
+    if profil:
+        import cProfile
+        import pstats
+
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        prof.runcall(action)
+        ms = (time.perf_counter() - t0) * 1000.0
+        pstats.Stats(prof, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+    else:
+        t0 = time.perf_counter()
+        action()
+        ms = (time.perf_counter() - t0) * 1000.0
+    return {"ms": ms, "imports": sorted(_charges() - avant)}
+
+
+def mesurer_app(app, lignes, profil=False):
+    t0 = time.perf_counter()
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+    resultat = {"app": app, "import_streamlit_ms": (time.perf_counter() - t0) * 1000.0}
+
+    user_id, classeur = classeur_synthetique(app, lignes)
+    installer(classeur)
+    at = AppTest.from_file(os.path.join(RACINE, app), default_timeout=120)
+    at.secrets["gcp_service_account"] = {"type": "service_account"}
+    at.secrets["app"] = {"spreadsheet_id": "bench", "stockage_local": ":memory:"}
+
+    def verifier():
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    def connexion():
+        if at.text_input:
+            at.text_input[0].input(user_id)
+        at.run()
+        verifier()
+
+    def suivi():
+        # onglets paresseux de l'app principale : AppTest ne renvoie pas l'onglet actif
+        at.session_state["onglet"] = ONGLET_SUIVI
+        at.run()
+        verifier()
+
+    resultat["etapes"] = {}
+    for nom, action in [("premiere_peinture", lambda: (at.run(), verifier())),
+                        ("donnees", connexion), ("suivi", suivi)]:
+        resultat["etapes"][nom] = etape(action, profil)
+    return resultat
+
+
+# =========================
+# Process neufs et médianes
+# =========================
+def lancer(app, args):
+    commande = [sys.executable, os.path.abspath(__file__), "--une", app, "--lignes", str(args.lignes)]
+    if args.profil:
+        commande.append("--profil")
+    sortie = subprocess.run(commande, capture_output=not args.profil, stdout=subprocess.PIPE if args.profil else None,
+                            text=True, check=True, cwd=RACINE)
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def medianes(mesures):
+    premiere = mesures[0]
+    resultat = {"app": premiere["app"], "repetitions": len(mesures),
+                "import_streamlit_ms": statistics.median(m["import_streamlit_ms"] for m in mesures), "etapes": {}}
+    for nom, e in premiere["etapes"].items():
+        resultat["etapes"][nom] = {"ms": statistics.median(m["etapes"][nom]["ms"] for m in mesures),
+                                   "imports": e["imports"]}
+    return resultat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", nargs="+", default=APPS)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--lignes", type=int, default=2000)
+    parser.add_argument("--profil", action="store_true", help="cProfile de chaque étape (sur stderr)")
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier au lieu de stdout")
+    parser.add_argument("--une", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.une:
+        print(json.dumps(mesurer_app(args.une, args.lignes, args.profil), ensure_ascii=False))
+        return
+
+    resultats = [medianes([lancer(app, args) for _ in range(args.repetitions)]) for app in args.apps]
+    sortie = json.dumps(resultats, indent=2, ensure_ascii=False)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(sortie)
+    else:
+        print(sortie)
+
+
+if __name__ == "__main__":
+    main()
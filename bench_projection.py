@@ -0,0 +1,75 @@
+"""Benchmark des projections (linéaire et TDEE adaptatif).
+
+    python bench_projection.py [--utilisateurs 10000]
+
+Vérifie d'abord que la projection adaptative correspond à une simulation
+jour par jour en pur Python, puis chronomètre 1 utilisateur (104 semaines)
+et un lot de plusieurs milliers de plans.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import projection
+from projection import SEMAINES_MAX, projections_adaptatives, projections_lineaires
+
+
+def simulation_boucle(poids, objectif, taille, age, sexe, pa, calories):
+    # référence : un pas par jour sur 104 semaines
+    out = [poids]
+    for _ in range(SEMAINES_MAX * 7):
+        bmr = 10 * poids + 6.25 * taille - 5 * age + (5 if sexe == "Homme" else -161)
+        poids = max(objectif, poids - max(0.0, pa * bmr - calories) / 7700.0)
+        out.append(poids)
+    return np.array(out)
+
+
+def plans_synthetiques(n, graine=0):
+    rng = np.random.default_rng(graine)
+    depart = rng.uniform(60, 130, n)
+    sexe = np.where(rng.random(n) < 0.5, "Femme", "Homme")
+    calories = np.where(sexe == "Femme", 1200.0, 1500.0) + rng.uniform(0, 800, n)
+    return list(zip(
+        depart, depart - rng.uniform(3, 30, n), rng.uniform(150, 195, n), rng.integers(18, 75, n),
+        sexe, rng.uniform(1.4, 1.9, n), calories,
+    ))
+
+
+def chrono(fonction, repetitions=5):
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        projection._projections_lineaires.cache_clear()
+        projection._projections_adaptatives.cache_clear()
+        t0 = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - t0)
+    return meilleur * 1000.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--utilisateurs", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    plans = plans_synthetiques(args.utilisateurs)
+    un = plans[:1]
+
+    ref = simulation_boucle(*un[0])
+    proj = projections_adaptatives(un)
+    n = proj.horizon[0] + 1
+    ecart = np.max(np.abs(proj.poids[0, :n] - ref[::7][:n]))
+    print(f"écart max vs simulation jour par jour : {ecart:.2e} kg")
+
+    ms_boucle = chrono(lambda: simulation_boucle(*un[0]))
+    ms_un = chrono(lambda: projections_adaptatives(un))
+    print(f"1 utilisateur, 104 semaines : boucle Python {ms_boucle:.2f} ms | vectorisé {ms_un:.3f} ms")
+
+    lineaires = [(p[0], p[1], 500.0) for p in plans]
+    ms_lot = chrono(lambda: projections_adaptatives(plans), repetitions=3)
+    ms_lin = chrono(lambda: projections_lineaires(lineaires), repetitions=3)
+    print(f"{len(plans)} plans : adaptatif {ms_lot:.1f} ms | linéaire {ms_lin:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Benchmark de la couche d'accès aux données, sur un faux gspread.Worksheet.
+
+    python bench_stockage.py [--lignes 1000 100000] [--utilisateurs 1000]
+                             [--latence-ms 0] [--us-par-ligne 0] [--quota 0]
+                             [--repetitions 20] [--json resultats.json]
+
+FeuilleSimulee reprend FeuilleMemoire en ajoutant une latence par appel
+(+ un coût par ligne transférée), des erreurs de quota aléatoires et le
+comptage des appels API. Pour chaque taille de feuille, on chronomètre
+profil_lire_user, profil_upsert_user, poids_lire_user_df et
+poids_ajouter_ou_maj_user :
+
+- "feuille" : stockage.feuille_* (get_all_values à chaque appel), appelées
+              par app_multiUsers.py
+- "local"   : StockageLocal + CacheUtilisateurs, comme dans l'app
+              principale ; écritures recopiées par le miroir en arrière-plan
+
+Les deux accès appellent les fonctions des apps sans leur couche
+Streamlit (st.cache_data, traces, valeurs par défaut du profil).
+
+Le JSON (--json) garde ms et appels API par opération, pour comparer
+deux versions avant déploiement.
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from historique import Historique
+from stockage import (
+    CacheUtilisateurs, ClasseurMemoire, FeuilleMemoire, MiroirFeuilles, StockageLocal,
+    feuille_poids_ecrire, feuille_poids_lire, feuille_profil_ecrire, feuille_profil_lire,
+)
+
+OPERATIONS = ["profil_lire_user", "profil_upsert_user", "poids_lire_user_df", "poids_ajouter_ou_maj_user"]
+
+
+# =========================
+# Faux Worksheet : latence, quota, comptage
+# =========================
+class ErreurQuota(Exception):
+    """Équivalent local de l'APIError 429 de gspread."""
+
+
+class FeuilleSimulee(FeuilleMemoire):
+    APPELS = {"get", "batch_get", "get_all_values", "append_row", "append_rows", "update", "batch_update", "clear"}
+
+    def __init__(self, lignes=None, titre="", latence=0.0, cout_ligne=0.0, quota=0.0, compteur=None, graine=0):
+        # lignes déjà en str : pas de recopie (jusqu'à 1 000 000 de lignes)
+        super().__init__(None, titre)
+        self.lignes = lignes if lignes is not None else []
+        self.latence = latence
+        self.cout_ligne = cout_ligne
+        self.quota = quota
+        self.compteur = compteur if compteur is not None else Counter()
+        self._rng = random.Random(graine)
+        self._en_cours = False
+
+    def __getattribute__(self, nom):
+        attr = super().__getattribute__(nom)
+        if nom not in FeuilleSimulee.APPELS or super().__getattribute__("_en_cours"):
+            return attr
+
+        def appel(*args, **kwargs):
+            # append_row -> append_rows, batch_get -> get : un seul appel API
+            if self._en_cours:
+                return attr(*args, **kwargs)
+            self.compteur[nom] += 1
+            self.compteur["appels"] += 1
+            if self.quota and self._rng.random() < self.quota:
+                self.compteur["erreurs_quota"] += 1
+                raise ErreurQuota(f"{self.title}.{nom} : quota dépassé (simulé)")
+            self._en_cours = True
+            try:
+                resultat = attr(*args, **kwargs)
+            finally:
+                self._en_cours = False
+            n = len(resultat) if isinstance(resultat, list) else 1
+            if self.latence or self.cout_ligne:
+                time.sleep(self.latence + n * self.cout_ligne)
+            self.compteur["lignes_lues"] += n if nom in ("get", "get_all_values") else 0
+            return resultat
+        return appel
+
+
+def feuilles_synthetiques(lignes, utilisateurs, graine=0):
+    # poids : chaque jour, chaque utilisateur se pèse (append au fil de l'eau)
+    rng = np.random.default_rng(graine)
+    users = [f"u{u:05d}" for u in range(utilisateurs)]
+    jours = max(1, lignes // utilisateurs)
+    debut = np.datetime64("2020-01-01")
+    dates = [str(debut + j) for j in range(jours)]
+    base = rng.uniform(60, 110, utilisateurs)
+    poids = [["user_id", "date", "poids"]]
+    for j, d in enumerate(dates):
+        for u, uid in enumerate(users):
+            if len(poids) > lignes:
+                break
+            poids.append([uid, d, f"{base[u] - 0.01 * j:.1f}"])
+
+    profil_large = [["user_id", "poids_actuel", "taille_cm", "age", "sexe", "objectif"]]
+    profil_cle_valeur = [["user_id", "key", "value"]]
+    for u, uid in enumerate(users):
+        valeurs = {"poids_actuel": f"{base[u]:.1f}", "taille_cm": "170.0", "age": "35",
+                   "sexe": "Femme", "objectif": f"{base[u] - 10:.1f}"}
+        profil_large.append([uid, *valeurs.values()])
+        profil_cle_valeur += [[uid, k, v] for k, v in valeurs.items()]
+    return users, dates[-1], poids, profil_large, profil_cle_valeur
+
+
+# =========================
+# "feuille" : app_multiUsers.py (sans st.cache_data)
+# =========================
+class AccesFeuille:
+    def __init__(self, ws_profil, ws_poids):
+        self.ws_profil, self.ws_poids = ws_profil, ws_poids
+
+    def profil_lire_user(self, user_id):
+        return feuille_profil_lire(self.ws_profil, user_id)
+
+    def profil_upsert_user(self, user_id, data):
+        feuille_profil_ecrire(self.ws_profil, user_id, data)
+
+    def poids_lire_user_df(self, user_id):
+        return pd.DataFrame(feuille_poids_lire(self.ws_poids, user_id), columns=["date", "poids"])
+
+    def poids_ajouter_ou_maj_user(self, user_id, date_iso, poids):
+        feuille_poids_ecrire(self.ws_poids, user_id, date_iso, poids)
+
+    def attendre(self):
+        pass
+
+    def attendre(self):
+        pass
+
+
+# =========================
+# "local" : StockageLocal + caches (app_multiUsers_allActivities.py, sans
+# get_stockage : un seul shard)
+# =========================
+class AccesLocal:
+    def __init__(self, ws_profil, ws_poids):
+        self.stockage = StockageLocal(lambda: (ws_profil, ws_poids))
+        self.stockage.ouvrir()
+        self.cache_profil = CacheUtilisateurs(self.stockage.profil_lire, taille_max=500)
+        self.cache_poids = CacheUtilisateurs(
+            lambda u: Historique.depuis_lignes(self.stockage.poids_lire(u)), taille_max=500
+        )
+
+    def profil_lire_user(self, user_id):
+        return self.cache_profil.lire(user_id)
+
+    def profil_upsert_user(self, user_id, data):
+        valeurs = self.stockage.profil_ecrire(user_id, data)
+        self.cache_profil.modifier(user_id, lambda p: {**p, **valeurs})
+
+    def poids_lire_user_df(self, user_id):
+        return self.cache_poids.lire(user_id)
+
+    def poids_ajouter_ou_maj_user(self, user_id, date_iso, poids):
+        self.stockage.poids_ecrire(user_id, date_iso, poids)
+        self.cache_poids.modifier(user_id, lambda h: h.avec(date_iso, float(poids)))
+
+    def attendre(self):
+        self.stockage.miroir.attendre()
+
+
+def mesurer(acces, operation, appels, compteur):
+    # -> (ms moyen par op, appels API par op, erreurs)
+    avant = compteur["appels"]
+    erreurs = 0
+    t0 = time.perf_counter()
+    for args in appels:
+        try:
+            getattr(acces, operation)(*args)
+        except ErreurQuota:
+            erreurs += 1
+    ms = (time.perf_counter() - t0) * 1000.0 / len(appels)
+    # écritures différées : comptées une fois le miroir vidé
+    acces.attendre()
+    return ms, (compteur["appels"] - avant) / len(appels), erreurs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lignes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--utilisateurs", type=int, default=1000)
+    parser.add_argument("--latence-ms", type=float, default=0.0, help="latence simulée par appel API")
+    parser.add_argument("--us-par-ligne", type=float, default=0.0, help="coût simulé par ligne transférée")
+    parser.add_argument("--quota", type=float, default=0.0, help="probabilité d'erreur de quota par appel")
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier")
+    args = parser.parse_args(argv)
+
+    # erreurs de quota simulées : retentées par le miroir, sans trace dans la sortie
+    logging.getLogger("stockage").setLevel(logging.CRITICAL)
+    # retries rapides : on mesure le coût des appels, pas l'attente
+    MiroirFeuilles.fenetre = 0.05
+    MiroirFeuilles.delai_retry = 0.01
+
+    resultats = []
+    for lignes in args.lignes:
+        utilisateurs = min(args.utilisateurs, max(1, lignes))
+        users, dernier_jour, poids, profil_large, profil_cv = feuilles_synthetiques(lignes, utilisateurs)
+        rng = random.Random(1)
+        cibles = [rng.choice(users) for _ in range(args.repetitions)]
+        jour = str(np.datetime64(dernier_jour) + 1)
+        scenarios = {
+            "profil_lire_user": [(u,) for u in cibles],
+            "profil_upsert_user": [(u, {"objectif": 55.0 + i % 10, "age": 36}) for i, u in enumerate(cibles)],
+            "poids_lire_user_df": [(u,) for u in cibles],
+            "poids_ajouter_ou_maj_user": [(u, jour if i % 2 else dernier_jour, 70.0 + i % 7)
+                                          for i, u in enumerate(cibles)],
+        }
+        print(f"{len(poids) - 1} lignes poids, {utilisateurs} utilisateurs :")
+        for nom, classe, profil in [("feuille", AccesFeuille, profil_cv), ("local", AccesLocal, profil_large)]:
+            compteur = Counter()
+            options = dict(latence=args.latence_ms / 1000.0, cout_ligne=args.us_par_ligne / 1e6,
+                           compteur=compteur)
+            classeur = ClasseurMemoire({
+                "profil": FeuilleSimulee([list(r) for r in profil], titre="profil", **options),
+                "poids": FeuilleSimulee([list(r) for r in poids], titre="poids", **options),
+            })
+            t0 = time.perf_counter()
+            acces = classe(classeur.worksheet("profil"), classeur.worksheet("poids"))
+            demarrage = (time.perf_counter() - t0) * 1000.0
+            appels_demarrage = compteur["appels"]
+            for ws in classeur.feuilles.values():
+                ws.quota = args.quota  # erreurs de quota après le chargement initial
+            ligne = {"acces": nom, "lignes": len(poids) - 1, "utilisateurs": utilisateurs,
+                     "demarrage_ms": demarrage, "demarrage_appels": appels_demarrage}
+            for op in OPERATIONS:
+                ms, appels, erreurs = mesurer(acces, op, scenarios[op], compteur)
+                ligne[op] = {"ms": ms, "appels": appels, "erreurs": erreurs}
+            ligne["lignes_lues"] = compteur["lignes_lues"]
+            resultats.append(ligne)
+            print(f"  {nom:8s} démarrage {demarrage:8.1f} ms ({appels_demarrage} appels)")
+            for op in OPERATIONS:
+                r = ligne[op]
+                erreurs = f", {r['erreurs']} erreurs quota" if r["erreurs"] else ""
+                print(f"    {op:27s} {r['ms']:9.3f} ms/op  {r['appels']:5.2f} appels/op{erreurs}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark du module tendances (moyennes glissantes vectorisées).
+
+    python bench_tendances.py [--utilisateurs 2000] [--annees 3]
+
+Compare l'ancienne boucle moyenne_glissante (O(n·window), pur Python) à la
+version NumPy, puis chronomètre tendances() sur un historique de
+plusieurs années pour des milliers d'utilisateurs.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from tendances import moyenne_glissante, tendances
+
+
+def moyenne_glissante_boucle(values, window=7):
+    # ancienne implémentation (app*.py)
+    out = []
+    for i in range(len(values)):
+        start = max(0, i - window + 1)
+        chunk = values[start:i + 1]
+        out.append(sum(chunk) / len(chunk))
+    return out
+
+
+def historique_synthetique(utilisateurs, annees, graine=0):
+    # mesures quasi quotidiennes (~80 % des jours) avec une tendance à la baisse
+    rng = np.random.default_rng(graine)
+    jours = int(365 * annees)
+    lignes = []
+    debut = np.datetime64("2023-01-01")
+    for u in range(utilisateurs):
+        garde = np.flatnonzero(rng.random(jours) < 0.8)
+        poids = 70 + 20 * rng.random() - 0.01 * garde + rng.normal(0, 0.4, len(garde))
+        lignes.append(pd.DataFrame({"user_id": f"u{u:05d}", "date": debut + garde, "poids": poids}))
+    df = pd.concat(lignes, ignore_index=True)
+    # user_id catégoriel, comme après ingestion (évite de factoriser des chaînes)
+    df["user_id"] = df["user_id"].astype("category")
+    return df
+
+
+def chrono(fonction, repetitions=5):
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - t0)
+    return meilleur * 1000.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--utilisateurs", type=int, default=2000)
+    parser.add_argument("--annees", type=float, default=3)
+    args = parser.parse_args(argv)
+
+    serie = list(historique_synthetique(1, args.annees)["poids"])
+    ms_boucle = chrono(lambda: moyenne_glissante_boucle(serie, 7))
+    ms_numpy = chrono(lambda: moyenne_glissante(serie, 7))
+    print(f"1 utilisateur, {len(serie)} mesures : boucle {ms_boucle:.2f} ms | NumPy {ms_numpy:.3f} ms")
+
+    df = historique_synthetique(args.utilisateurs, args.annees)
+    print(f"{args.utilisateurs} utilisateurs, {len(df)} mesures :")
+    for nom, kwargs in [
+        ("ma7", dict(fenetres=(7,), spans=(), jours=())),
+        ("ma7 + ma30 + moy_7j", dict(fenetres=(7, 30), spans=(), jours=(7,))),
+        ("ma7 + ma30 + moy_7j + ewma7", dict(fenetres=(7, 30), spans=(7,), jours=(7,))),
+    ]:
+        ms = chrono(lambda: tendances(df, **kwargs), repetitions=3)
+        print(f"  tendances({nom}) : {ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
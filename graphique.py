@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# plafond de points envoyés au navigateur, par série
+POINTS_MAX = 500
+
+# période affichée dans le suivi -> nombre de semaines (None = tout)
+PERIODES = {"1 mois": 4.3, "3 mois": 13.0, "1 an": 52.0, "Tout": None}
+
+
+# =========================
+# Sous-échantillonnage LTTB (Largest-Triangle-Three-Buckets)
+# =========================
+def lttb(x, y, n):
+    # Indices des n points gardés : premier et dernier conservés, puis dans
+    # chaque seau le point qui forme le plus grand triangle avec le point
+    # gardé précédent et la moyenne du seau suivant.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    taille = len(x)
+    if n >= taille or n < 3:
+        return np.arange(taille)
+
+    bords = np.linspace(1, taille - 1, n - 1).astype(int)
+    garde = np.empty(n, dtype=int)
+    garde[0], garde[-1] = 0, taille - 1
+    a = 0
+    for i in range(n - 2):
+        debut, fin = bords[i], bords[i + 1]
+        suivant = slice(bords[i + 1], bords[i + 2]) if i + 2 < n - 1 else slice(taille - 1, taille)
+        cx, cy = x[suivant].mean(), y[suivant].mean()
+        aires = np.abs((x[a] - cx) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (cy - y[a]))
+        a = debut + int(np.argmax(aires))
+        garde[i + 1] = a
+    return garde
+
+
+def reduire_series(df, points_max=POINTS_MAX, plage=None, x="semaine", y="poids", serie="serie"):
+    # df long (x | y | serie) -> au plus points_max points par série,
+    # restreint à la plage visible [debut, fin] de l'axe x.
+    if plage is not None:
+        df = df[df[x].between(*plage)]
+    morceaux = []
+    for _, g in df.groupby(serie, sort=False):
+        g = g.dropna(subset=[y])
+        if len(g) > points_max:
+            g = g.sort_values(x, kind="stable")
+            g = g.iloc[lttb(g[x].to_numpy(), g[y].to_numpy(), points_max)]
+        morceaux.append(g)
+    if not morceaux:
+        return df
+    return pd.concat(morceaux, ignore_index=True)
+
+
+def plage_periode(df, periode, x="semaine"):
+    # fenêtre visible : les `PERIODES[periode]` dernières semaines mesurées
+    semaines = PERIODES.get(periode)
+    if semaines is None or df.empty:
+        return None
+    fin = float(df[x].max())
+    return (fin - semaines, np.inf)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+# =========================
+# Historique de poids d'un utilisateur (colonnes NumPy compactes)
+# =========================
+def _en_jours(dates):
+    try:
+        return np.array(dates, dtype="datetime64[D]")
+    except ValueError:
+        # dates saisies à la main dans le Sheet (format non ISO) ; NaT si illisible
+        return pd.to_datetime(pd.Series(dates), errors="coerce", format="mixed").to_numpy().astype("datetime64[D]")
+
+
+class Historique:
+    """Mesures d'un utilisateur : jours (datetime64[D]) et poids (float32),
+    triés par date, une mesure par jour. Construit une fois à la lecture,
+    puis partagé entre sessions : les tableaux sont en lecture seule et une
+    mise à jour renvoie un nouvel Historique.
+    """
+
+    __slots__ = ("jours", "poids")
+
+    def __init__(self, jours, poids):
+        self.jours = np.asarray(jours, dtype="datetime64[D]")
+        self.poids = np.asarray(poids, dtype=np.float32)
+        self.jours.setflags(write=False)
+        self.poids.setflags(write=False)
+
+    @classmethod
+    def depuis_lignes(cls, rows):
+        # rows: [(date_iso, poids), ...] (déjà triées par poids_lire)
+        if not rows:
+            return cls(np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.float32))
+        dates, poids = zip(*rows)
+        jours = _en_jours(dates)
+        poids = np.array(poids, dtype=np.float32)
+        valides = ~np.isnat(jours)
+        if not valides.all():
+            jours, poids = jours[valides], poids[valides]
+        if len(jours) > 1 and np.any(jours[1:] <= jours[:-1]):
+            ordre = np.argsort(jours, kind="stable")
+            jours, poids = jours[ordre], poids[ordre]
+            # même jour écrit de deux façons : la dernière ligne gagne
+            garde = np.append(jours[1:] != jours[:-1], True)
+            jours, poids = jours[garde], poids[garde]
+        return cls(jours, poids)
+
+    def __len__(self):
+        return len(self.jours)
+
+    @property
+    def vide(self):
+        return len(self.jours) == 0
+
+    def position(self, date_iso: str):
+        # (indice, présent) par recherche binaire sur les jours triés
+        jour = np.datetime64(date_iso, "D")
+        i = int(np.searchsorted(self.jours, jour))
+        return i, i < len(self.jours) and self.jours[i] == jour
+
+    def avec(self, date_iso: str, poids: float) -> "Historique":
+        # Ajout ou remplacement de la mesure du jour, à sa place : jamais de
+        # tri. La copie (un memcpy) garde intact l'Historique déjà partagé.
+        i, present = self.position(date_iso)
+        if present:
+            valeurs = self.poids.copy()
+            valeurs[i] = poids
+            return Historique(self.jours, valeurs)
+        return Historique(
+            np.insert(self.jours, i, np.datetime64(date_iso, "D")),
+            np.insert(self.poids, i, np.float32(poids)),
+        )
+
+    def avec_lot(self, jours, poids) -> "Historique":
+        # Import en masse : mêmes règles que `avec`, en une passe vectorisée
+        # (les mesures importées remplacent celles du même jour).
+        jours = np.concatenate([self.jours, np.asarray(jours, dtype="datetime64[D]")])
+        poids = np.concatenate([self.poids, np.asarray(poids, dtype=np.float32)])
+        ordre = np.argsort(jours, kind="stable")
+        jours, poids = jours[ordre], poids[ordre]
+        garde = np.append(jours[1:] != jours[:-1], True)
+        return Historique(jours[garde], poids[garde])
+
+    def frame(self) -> pd.DataFrame:
+        # pour l'affichage (st.dataframe)
+        return pd.DataFrame({"date": self.jours, "poids": self.poids}, copy=False)
@@ -0,0 +1,264 @@
+"""Import / export en masse de l'historique de poids d'un utilisateur.
+
+Formats lus : CSV (séparateur deviné, virgule décimale acceptée), Parquet,
+et les exports CSV des balances courantes (Withings, Renpho, Fitbit,
+Garmin...) reconnus par le nom de leurs colonnes, en kg ou en livres.
+
+    python importation.py importer pesees.csv --user-id moi --spreadsheet-id ID --credentials compte.json [--dry-run]
+    python importation.py exporter sortie.csv --user-id moi --spreadsheet-id ID --credentials compte.json
+
+L'import fusionne le fichier avec l'historique existant (une mesure par
+jour, le fichier gagne) et n'envoie que les lignes nouvelles ou modifiées,
+en un seul lot (1 batch_update + 1 append_rows).
+"""
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from historique import Historique
+
+LIVRE = 0.45359237
+POIDS_MIN, POIDS_MAX = 20.0, 400.0
+
+# nom de colonne normalisé -> rôle (et facteur vers kg pour le poids)
+COLONNES_DATE = {
+    "date", "jour", "day", "datetime", "timestamp", "time", "horodatage",
+    "date de mesure", "time of measurement", "measurement date", "date/time",
+}
+COLONNES_POIDS = {
+    "poids": 1.0, "poids (kg)": 1.0, "poids_kg": 1.0, "weight": 1.0, "weight (kg)": 1.0,
+    "weight(kg)": 1.0, "weight_kg": 1.0, "body weight": 1.0, "body weight (kg)": 1.0,
+    "weight (lb)": LIVRE, "weight(lb)": LIVRE, "weight (lbs)": LIVRE, "weight(lbs)": LIVRE,
+    "weight_lb": LIVRE, "body weight (lb)": LIVRE,
+}
+
+
+# =========================
+# Lecture et validation
+# =========================
+def _normaliser(nom) -> str:
+    return re.sub(r"\s+", " ", str(nom).strip().strip('"').lower())
+
+
+def lire_fichier(source, nom: str = "") -> pd.DataFrame:
+    # source: chemin ou fichier ouvert (st.file_uploader) -> colonnes brutes (str)
+    nom = (nom or getattr(source, "name", "") or str(source)).lower()
+    if nom.endswith((".parquet", ".pq")):
+        return pd.read_parquet(source).astype(str)
+    # sep=None : "," ";" ou tabulation, selon le fichier
+    return pd.read_csv(source, sep=None, engine="python", dtype=str, encoding="utf-8-sig", skipinitialspace=True)
+
+
+def colonnes(df: pd.DataFrame):
+    # -> (colonne date, colonne poids, facteur vers kg)
+    noms = {_normaliser(c): c for c in df.columns}
+    date = next((noms[n] for n in noms if n in COLONNES_DATE), None)
+    poids = next((n for n in noms if n in COLONNES_POIDS), None)
+    if date is None or poids is None:
+        raise ValueError(f"colonnes date / poids introuvables (colonnes : {', '.join(map(str, df.columns))})")
+    return date, noms[poids], COLONNES_POIDS[poids]
+
+
+def _jour_en_premier(valeurs: pd.Series, defaut: bool) -> bool:
+    # sur toute la colonne : 13/04/2026 -> jour/mois, 04/13/2026 -> mois/jour,
+    # rien d'au-delà de 12 (03/04/2026...) -> `defaut`
+    champs = valeurs.str.extract(r"^\s*(\d{1,2})[/.-](\d{1,2})[/.-]\d{2,4}").astype(float)
+    if (champs[0] > 12).any():
+        return True
+    if (champs[1] > 12).any():
+        return False
+    return defaut
+
+
+# "…T23:30:00-05:00", "… 07:00 Z", "… 07:00:00+0100" : décalage après l'heure
+_FUSEAU = r"(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)\s*(?:Z|UTC|[+-]\d{2}:?\d{2})$"
+
+
+def _dates(valeurs: pd.Series, jour_en_premier: bool = True) -> pd.Series:
+    # ISO d'abord ; le reste (03/04/2026, 3 Apr 2026...) dans l'ordre
+    # jour/mois détecté sur la colonne. Fuseau ignoré (sans conversion) :
+    # une pesée à 23h30 reste sur son jour local.
+    valeurs = valeurs.astype(str).str.strip().str.replace(_FUSEAU, r"\1", regex=True).where(valeurs.notna())
+    iso = pd.to_datetime(valeurs, errors="coerce", format="ISO8601")
+    reste = iso.isna() & valeurs.notna()
+    if reste.any():
+        iso[reste] = pd.to_datetime(valeurs[reste], errors="coerce", format="mixed",
+                                    dayfirst=_jour_en_premier(valeurs[reste], jour_en_premier))
+    return iso
+
+
+def _poids(valeurs: pd.Series, facteur: float) -> pd.Series:
+    # "72,4" / "72.4 kg" / "159.6 lbs"
+    texte = valeurs.astype(str).str.strip().str.lower()
+    nombres = pd.to_numeric(texte.str.extract(r"(-?\d+(?:[.,]\d+)?)")[0].str.replace(",", "."), errors="coerce")
+    livres = texte.str.contains(r"\blbs?\b", regex=True) & (facteur == 1.0)
+    return nombres * np.where(livres, LIVRE, facteur)
+
+
+def valider(df: pd.DataFrame, jour_en_premier: bool = True):
+    """Colonnes brutes -> (mesures, rejets).
+
+    mesures : date (datetime64[D]) | poids (kg), une ligne par jour (la
+    dernière du fichier gagne), triées. rejets : ligne (numéro dans le
+    fichier) | raison. jour_en_premier : lecture des dates ambiguës
+    (03/04/2026) quand la colonne ne permet pas de trancher.
+    """
+    col_date, col_poids, facteur = colonnes(df)
+    dates = _dates(df[col_date], jour_en_premier)
+    poids = _poids(df[col_poids], facteur)
+
+    raisons = pd.Series("", index=df.index)
+    raisons[~poids.between(POIDS_MIN, POIDS_MAX)] = f"poids hors de [{POIDS_MIN:g}, {POIDS_MAX:g}] kg"
+    raisons[poids.isna()] = "poids illisible"
+    raisons[dates.isna()] = "date illisible"
+    ok = raisons == ""
+    rejets = pd.DataFrame({"ligne": df.index[~ok] + 2, "raison": raisons[~ok]}).reset_index(drop=True)
+
+    mesures = pd.DataFrame({
+        "date": dates[ok].to_numpy().astype("datetime64[D]"),
+        "poids": poids[ok].round(2).to_numpy(),
+        "ordre": np.arange(ok.sum()),
+    })
+    # plusieurs pesées le même jour : la dernière (heure, puis ordre du fichier)
+    mesures["heure"] = dates[ok].to_numpy()
+    mesures = mesures.sort_values(["date", "heure", "ordre"], kind="stable")
+    mesures = mesures.drop_duplicates("date", keep="last")[["date", "poids"]].reset_index(drop=True)
+    return mesures, rejets
+
+
+def fusionner(hist: Historique, mesures: pd.DataFrame):
+    """Upsert vectorisé contre l'historique existant.
+
+    -> (nouvel Historique, lignes à écrire [(date_iso, poids)], stats)
+    """
+    jours = mesures["date"].to_numpy().astype("datetime64[D]")
+    poids = mesures["poids"].to_numpy(dtype=np.float32)
+    i = np.searchsorted(hist.jours, jours)
+    present = i < len(hist.jours)
+    present[present] = hist.jours[i[present]] == jours[present]
+    identique = present.copy()
+    identique[present] = hist.poids[i[present]] == poids[present]
+    a_ecrire = ~identique
+
+    stats = {
+        "ajouts": int((~present).sum()),
+        "modifications": int((present & a_ecrire).sum()),
+        "inchangees": int(identique.sum()),
+    }
+    dates_iso = np.datetime_as_string(jours[a_ecrire], unit="D")
+    lignes = list(zip(dates_iso.tolist(), mesures["poids"].to_numpy()[a_ecrire].tolist()))
+    return hist.avec_lot(jours[a_ecrire], poids[a_ecrire]), lignes, stats
+
+
+# =========================
+# Export en flux
+# =========================
+def flux_csv(paquets):
+    # paquets de [(date_iso, poids), ...] (StockageLocal.poids_iterer) -> octets CSV
+    yield b"date,poids\r\n"
+    for paquet in paquets:
+        tampon = io.StringIO()
+        csv.writer(tampon).writerows(paquet)
+        yield tampon.getvalue().encode("utf-8")
+
+
+class FluxOctets(io.RawIOBase):
+    """Fichier en lecture seule au-dessus d'un générateur d'octets."""
+
+    def __init__(self, morceaux):
+        self._morceaux = iter(morceaux)
+        self._reste = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, tampon):
+        while not self._reste:
+            try:
+                self._reste = next(self._morceaux)
+            except StopIteration:
+                return 0
+        n = min(len(tampon), len(self._reste))
+        tampon[:n], self._reste = self._reste[:n], self._reste[n:]
+        return n
+
+
+def exporter(paquets, sortie: str):
+    # CSV ou Parquet (un row group par paquet), écrit au fil de l'eau
+    if not sortie.lower().endswith((".parquet", ".pq")):
+        with open(sortie, "wb") as f:
+            for morceau in flux_csv(paquets):
+                f.write(morceau)
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("date", pa.date32()), ("poids", pa.float64())])
+    with pq.ParquetWriter(sortie, schema) as ecrivain:
+        for paquet in paquets:
+            dates, poids = zip(*paquet)
+            ecrivain.write_table(pa.table({
+                "date": pa.array(np.array(dates, dtype="datetime64[D]"), pa.date32()),
+                "poids": pa.array(poids, pa.float64()),
+            }, schema=schema))
+
+
+# =========================
+# Ligne de commande (hors Streamlit)
+# =========================
+def _stockage(spreadsheet_id, credentials):
+    import gspread
+
+    from stockage import StockageLocal
+
+    sh = gspread.service_account(filename=credentials).open_by_key(spreadsheet_id)
+    stockage = StockageLocal(lambda: (sh.worksheet("profil"), sh.worksheet("poids")), asynchrone=False)
+    stockage.charger_depuis_feuilles()
+    return stockage
+
+
+def importer(stockage, user_id, source, dry_run=False, jour_en_premier=True):
+    mesures, rejets = valider(lire_fichier(source), jour_en_premier)
+    hist = Historique.depuis_lignes(stockage.poids_lire(user_id))
+    _, lignes, stats = fusionner(hist, mesures)
+    if not dry_run:
+        stockage.poids_ecrire_lot(user_id, lignes)
+    return stats, rejets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import / export en masse de l'historique de poids.")
+    parser.add_argument("action", choices=["importer", "exporter"])
+    parser.add_argument("fichier", help="CSV ou Parquet à importer, ou fichier de sortie")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--spreadsheet-id", required=True)
+    parser.add_argument("--credentials", required=True, help="fichier JSON du compte de service")
+    parser.add_argument("--dry-run", action="store_true", help="affiche le bilan sans écrire")
+    parser.add_argument("--mois-en-premier", action="store_true",
+                        help="dates ambiguës (03/04/2026) lues mois/jour (par défaut jour/mois)")
+    args = parser.parse_args(argv)
+
+    user_id = args.user_id.strip().lower()
+    stockage = _stockage(args.spreadsheet_id, args.credentials)
+    if args.action == "exporter":
+        exporter(stockage.poids_iterer(user_id), args.fichier)
+        print(f"{args.fichier} : {os.path.getsize(args.fichier)} octets")
+        return
+    try:
+        stats, rejets = importer(stockage, user_id, args.fichier, args.dry_run, not args.mois_en_premier)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{stats['ajouts']} ajoutées, {stats['modifications']} modifiées, "
+          f"{stats['inchangees']} inchangées, {len(rejets)} rejetées")
+    for r in rejets.itertuples():
+        print(f"  ligne {r.ligne} : {r.raison}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Migration hors ligne de la feuille profil vers une ligne par utilisateur.
+
+Entrées acceptées : user_id | key | value (apps multi-utilisateurs) et
+key | value (app.py, un seul utilisateur : --user-id obligatoire).
+
+    python migrer_profil.py ancien.csv nouveau.csv [--user-id moi]
+    python migrer_profil.py --spreadsheet-id ID --credentials compte.json [--user-id moi] [--dry-run]
+"""
+import argparse
+import csv
+import sys
+
+from stockage import profil_migrer_lignes
+
+
+def migrer_csv(entree, sortie, user_id=None):
+    with open(entree, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    lignes, ignorees = profil_migrer_lignes(rows, user_id=user_id)
+    with open(sortie, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(lignes)
+    return lignes, ignorees
+
+
+def migrer_feuille(spreadsheet_id, credentials, user_id=None, dry_run=False):
+    import gspread
+
+    ws = gspread.service_account(filename=credentials).open_by_key(spreadsheet_id).worksheet("profil")
+    rows = ws.get_all_values()
+    lignes, ignorees = profil_migrer_lignes(rows, user_id=user_id)
+    if not dry_run:
+        # une seule écriture : les anciennes lignes en trop sont vidées
+        largeur = max([len(r) for r in rows + lignes] or [0])
+        bloc = [r + [""] * (largeur - len(r)) for r in lignes]
+        bloc += [[""] * largeur for _ in range(len(rows) - len(lignes))]
+        ws.update(values=bloc, range_name="A1")
+    return lignes, ignorees
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migre la feuille profil au format une ligne par utilisateur.")
+    parser.add_argument("entree", nargs="?", help="CSV exporté de l'ancienne feuille profil")
+    parser.add_argument("sortie", nargs="?", help="CSV au nouveau format")
+    parser.add_argument("--spreadsheet-id", help="migrer directement la feuille Google Sheets")
+    parser.add_argument("--credentials", help="fichier JSON du compte de service")
+    parser.add_argument("--user-id", help="user_id à utiliser pour le format key | value (app.py)")
+    parser.add_argument("--dry-run", action="store_true", help="affiche le résultat sans écrire")
+    args = parser.parse_args(argv)
+
+    if args.spreadsheet_id and not args.credentials:
+        parser.error("--credentials est obligatoire avec --spreadsheet-id")
+    if not args.spreadsheet_id and not (args.entree and args.sortie):
+        parser.error("donner entree.csv sortie.csv, ou --spreadsheet-id")
+    try:
+        if args.spreadsheet_id:
+            lignes, ignorees = migrer_feuille(args.spreadsheet_id, args.credentials, args.user_id, args.dry_run)
+        else:
+            lignes, ignorees = migrer_csv(args.entree, args.sortie, args.user_id)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.dry_run:
+        csv.writer(sys.stdout).writerows(lignes)
+    print(f"{len(lignes) - 1} profil(s) migré(s).", file=sys.stderr)
+    if ignorees:
+        print(f"Clés ignorées (absentes du schéma) : {', '.join(sorted(ignorees))}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import bisect
+import hashlib
+import logging
+
+log = logging.getLogger(__name__)
+
+# classeur de app.spreadsheet_id : shard par défaut, porte aussi la table de routage
+PRINCIPAL = "principal"
+FEUILLE_ROUTAGE = "routage"
+EPINGLE, MANUEL = "epingle", "manuel"
+
+
+# =========================
+# Hachage cohérent user_id -> shard
+# =========================
+def _hache(cle: str) -> int:
+    # stable d'un process à l'autre (contrairement à hash())
+    return int.from_bytes(hashlib.blake2b(cle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Anneau:
+    """Chaque shard occupe `points` positions sur l'anneau : ajouter un
+    shard n'en déplace qu'environ 1/N des utilisateurs."""
+
+    def __init__(self, shards, points=64):
+        positions = sorted((_hache(f"{s}#{i}"), s) for s in shards for i in range(points))
+        self._positions = [p for p, _ in positions]
+        self._shards = [s for _, s in positions]
+
+    def shard(self, user_id: str) -> str:
+        i = bisect.bisect(self._positions, _hache(user_id)) % len(self._positions)
+        return self._shards[i]
+
+
+class Routage:
+    """user_id -> shard : table d'exceptions (utilisateurs déplacés à la
+    main, ou épinglés sur leur shard actuel par `reequilibrer.py --epingler`
+    avant l'ajout d'un shard), sinon l'anneau."""
+
+    def __init__(self, classeurs, exceptions=None, points=64):
+        # classeurs: {shard: spreadsheet_id}
+        self.classeurs = dict(classeurs)
+        self.anneau = Anneau(self.classeurs, points)
+        self.exceptions = {}
+        for user_id, shard in (exceptions or {}).items():
+            if shard in self.classeurs:
+                self.exceptions[user_id] = shard
+            else:
+                log.warning("Routage : shard %s inconnu pour %s, ignoré", shard, user_id)
+
+    def shard(self, user_id: str) -> str:
+        return self.exceptions.get(user_id) or self.anneau.shard(user_id)
+
+
+def classeurs_config(config) -> dict:
+    # [app] spreadsheet_id = "..." et, optionnel, [app.shards] nom = "id"
+    return {PRINCIPAL: config["spreadsheet_id"], **dict(config.get("shards", {}))}
+
+
+def _lignes_routage(sh):
+    # feuille "routage" (user_id | shard | origine) du classeur principal ; absente = aucune
+    if FEUILLE_ROUTAGE not in {ws.title for ws in sh.worksheets()}:
+        return []
+    return [r for r in sh.worksheet(FEUILLE_ROUTAGE).get_all_values()[1:] if len(r) >= 2 and r[0] and r[1]]
+
+
+def lire_exceptions(sh) -> dict:
+    return {r[0]: r[1] for r in _lignes_routage(sh)}
+
+
+def lire_epingles(sh) -> set:
+    # exceptions posées par reequilibrer.py (origine "epingle") : un
+    # rééquilibrage complet peut les déplacer, pas les déplacements à la main
+    return {r[0] for r in _lignes_routage(sh) if len(r) >= 3 and r[2] == EPINGLE}
+
+
+# =========================
+# Déplacement d'un utilisateur entre shards (rééquilibrage)
+# =========================
+# clé d'une ligne, par feuille (profil, poids). "key" : format
+# user_id | key | value (app_multiUsers.py) ; absente du format large,
+# où elle vaut "" (une ligne par utilisateur).
+CLES = (("user_id", "key"), ("user_id", "date"))
+
+
+def _plages(numeros):
+    # [3, 4, 5, 9] -> [(3, 5), (9, 9)]
+    plages = []
+    for n in sorted(numeros):
+        if plages and n == plages[-1][1] + 1:
+            plages[-1] = (plages[-1][0], n)
+        else:
+            plages.append((n, n))
+    return plages
+
+
+def supprimer_lignes(ws, numeros):
+    # de la fin vers le début ; une seule requête avec gspread
+    plages = _plages(numeros)[::-1]
+    if not plages:
+        return
+    if hasattr(ws, "spreadsheet"):
+        ws.spreadsheet.batch_update({"requests": [
+            {"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS",
+                                           "startIndex": debut - 1, "endIndex": fin}}}
+            for debut, fin in plages
+        ]})
+    else:
+        for debut, fin in plages:
+            ws.delete_rows(debut, fin)
+
+
+def _copier(ws_src, ws_dst, user_id, cles):
+    """Fusionne les lignes de user_id de ws_src dans ws_dst, par clé (noms
+    de colonnes `cles`). Les lignes déjà à la destination (copie
+    interrompue, ou écrites là depuis) gagnent : seules leurs cellules vides
+    sont complétées. -> numéros des lignes de l'utilisateur dans ws_src (à
+    supprimer ensuite).
+    """
+    rows = ws_src.get_all_values()
+    lignes = [(n, r) for n, r in enumerate(rows[1:], start=2) if r and r[0] == user_id]
+    if not lignes:
+        return []
+    entetes = [c.strip() for c in rows[0]]
+
+    rows_dst = ws_dst.get_all_values()
+    entetes_dst = [c.strip() for c in rows_dst[0]] if rows_dst else []
+    if entetes_dst and ("key" in entetes) != ("key" in entetes_dst):
+        raise ValueError(f"{getattr(ws_src, 'title', '')} : formats différents d'un classeur à l'autre "
+                         f"({' | '.join(entetes)} / {' | '.join(entetes_dst)}), convertir avec migrer_profil.py")
+    # colonnes appariées par nom : l'ordre peut différer d'un classeur à l'autre
+    manquantes = [c for c in entetes if c not in entetes_dst]
+    if manquantes:
+        entetes_dst += manquantes
+        ws_dst.update(values=[entetes_dst], range_name="A1")
+
+    # comme à la lecture par l'app : en cas de doublon, la première ligne gagne
+    presentes = {}
+    for n, r in enumerate(rows_dst[1:], start=2):
+        if r and r[0] == user_id:
+            valeurs = dict(zip(entetes_dst, r))
+            presentes.setdefault(tuple(valeurs.get(c, "") for c in cles), (n, valeurs))
+    ajouts, maj = [], []
+    for _, r in lignes:
+        valeurs = dict(zip(entetes, r))
+        cle = tuple(valeurs.get(c, "") for c in cles)
+        if cle not in presentes:
+            presentes[cle] = (None, valeurs)
+            ajouts.append([valeurs.get(c, "") for c in entetes_dst])
+            continue
+        n, existantes = presentes[cle]
+        vides = {c: v for c, v in valeurs.items() if v != "" and existantes.get(c, "") == ""}
+        if n is not None and vides:
+            existantes.update(vides)
+            maj.append({"range": f"A{n}", "values": [[existantes.get(c, "") for c in entetes_dst]]})
+    if maj:
+        ws_dst.batch_update(maj)
+    if ajouts:
+        ws_dst.append_rows(ajouts)
+    return [n for n, _ in lignes]
+
+
+def ecrire_exception(ws_routage, user_id, shard, origine=MANUEL):
+    ecrire_exceptions(ws_routage, {user_id: shard}, origine)
+
+
+def ecrire_exceptions(ws_routage, exceptions, origine=MANUEL):
+    # exceptions: {user_id: shard} ; 1 lecture, au plus 1 batch_update + 1 append_rows
+    rows = ws_routage.get_all_values()
+    if not rows:
+        ws_routage.append_row(["user_id", "shard", "origine"])
+    restantes = dict(exceptions)
+    maj = []
+    if rows and len(rows[0]) < 3:
+        maj.append({"range": "C1", "values": [["origine"]]})
+    for n, r in enumerate(rows[1:], start=2):
+        if r and r[0] in restantes:
+            maj.append({"range": f"B{n}:C{n}", "values": [[restantes.pop(r[0]), origine]]})
+    if maj:
+        ws_routage.batch_update(maj)
+    if restantes:
+        ws_routage.append_rows([[u, shard, origine] for u, shard in restantes.items()])
+
+
+def deplacer(user_id, source, destination, ws_routage, vers, origine=MANUEL):
+    """Déplace les lignes profil + poids de user_id d'un shard à l'autre.
+
+    origine : MANUEL (--user-id / --vers, gardé par les rééquilibrages
+    suivants) ou EPINGLE (rééquilibrage complet).
+
+    source / destination : (ws_profil, ws_poids). Ordre sûr : fusion à la
+    destination, puis routage, puis suppression à la source ; relancer après
+    une interruption ne duplique rien. -> nombre de lignes déplacées par
+    feuille.
+    """
+    copiees = [_copier(ws_src, ws_dst, user_id, cles)
+               for ws_src, ws_dst, cles in zip(source, destination, CLES)]
+    ecrire_exception(ws_routage, user_id, vers, origine)
+    for ws_src, numeros in zip(source, copiees):
+        supprimer_lignes(ws_src, numeros)
+    return {"profil": len(copiees[0]), "poids": len(copiees[1])}
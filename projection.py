@@ -0,0 +1,112 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+KCAL_PAR_KG = 7700.0
+SEMAINES_MAX = 104
+
+
+class Projections(NamedTuple):
+    semaines: np.ndarray      # (S,) 0..S-1, grille commune
+    poids: np.ndarray         # (n, S) NaN au-delà de l'horizon de chaque plan
+    semaines_est: np.ndarray  # (n,) durée estimée pour atteindre l'objectif
+    horizon: np.ndarray       # (n,) dernière semaine tracée pour chaque plan
+
+
+# =========================
+# Projection linéaire (déficit constant), plusieurs plans d'un coup
+# =========================
+def projections_lineaires(plans) -> Projections:
+    # plans: [(poids_depart, objectif, deficit_reel), ...]
+    return _projections_lineaires(tuple((float(a), float(b), float(c)) for a, b, c in plans))
+
+
+@lru_cache(maxsize=256)
+def _projections_lineaires(plans) -> Projections:
+    p = np.asarray(plans, dtype=float).reshape(-1, 3)
+    depart, objectif, deficit = p[:, 0], p[:, 1], p[:, 2]
+
+    perte_par_semaine = (deficit * 7) / KCAL_PAR_KG
+    semaines_est = (depart - objectif) / np.maximum(perte_par_semaine, 1e-6)
+    horizon = np.minimum(SEMAINES_MAX, np.maximum(4, semaines_est + 2)).astype(int)
+
+    semaines = np.arange(int(horizon.max(initial=0)) + 1)
+    poids = np.maximum(objectif[:, None], depart[:, None] - perte_par_semaine[:, None] * semaines)
+    poids[semaines[None, :] > horizon[:, None]] = np.nan
+
+    # résultat partagé par le cache : lecture seule
+    for a in (semaines, poids, semaines_est, horizon):
+        a.setflags(write=False)
+    return Projections(semaines, poids, semaines_est, horizon)
+
+
+def projection_lineaire(poids_depart, objectif, deficit_reel):
+    # Un seul plan -> (semaines, poids, semaines_est), mêmes valeurs que
+    # l'ancien calcul de l'onglet Plan/Suivi.
+    proj = projections_lineaires([(poids_depart, objectif, deficit_reel)])
+    n = proj.horizon[0] + 1
+    return proj.semaines[:n], proj.poids[0, :n], float(proj.semaines_est[0])
+
+
+# =========================
+# Projection adaptative : le TDEE baisse avec le poids
+# =========================
+def projections_adaptatives(plans) -> Projections:
+    # plans: [(poids_depart, objectif, taille_cm, age, sexe, pa, calories_cible), ...]
+    # pa = pAb_from_job(...) + pAs_from_sport_hours(...), calories_cible déjà
+    # relevée au plancher min_cal.
+    return _projections_adaptatives(tuple(
+        (float(a), float(b), float(c), float(d), str(e), float(f), float(g))
+        for a, b, c, d, e, f, g in plans
+    ))
+
+
+@lru_cache(maxsize=256)
+def _projections_adaptatives(plans) -> Projections:
+    """Simulation jour par jour, apport fixe = calories_cible :
+
+        tdee(j)    = pa * bmr_mifflin_st_jeor(poids(j), taille, age, sexe)
+        poids(j+1) = poids(j) - max(0, tdee(j) - calories_cible) / 7700
+
+    Le BMR est affine en poids, donc la récurrence a une solution exacte
+    poids(j) = p_eq + (p0 - p_eq) * r**j (p_eq : poids où tdee = apport) :
+    on l'évalue directement sur toute la grille, pour tous les plans.
+    """
+    n = len(plans)
+    depart, objectif, taille, age, pa, calories = (
+        np.array([p[i] for p in plans], dtype=float) for i in (0, 1, 2, 3, 5, 6)
+    )
+    homme = np.array([p[4] == "Homme" for p in plans], dtype=bool)
+
+    constante = 6.25 * taille - 5 * age + np.where(homme, 5.0, -161.0)
+    p_eq = (calories / np.maximum(pa, 1e-6) - constante) / 10.0
+    r = 1.0 - 10.0 * pa / KCAL_PAR_KG
+    en_deficit = depart > p_eq
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jours_est = np.where(
+            en_deficit & (objectif > p_eq),
+            np.log((objectif - p_eq) / (depart - p_eq)) / np.log(r),
+            np.inf,
+        )
+    jours_est = np.where(objectif >= depart, 0.0, jours_est)
+    semaines_est = jours_est / 7.0
+    horizon = np.minimum(SEMAINES_MAX, np.maximum(4, semaines_est + 2)).astype(int)
+
+    semaines = np.arange(int(horizon.max(initial=0)) + 1)
+    jours = 7 * semaines
+    poids = p_eq[:, None] + (depart - p_eq)[:, None] * r[:, None] ** jours[None, :]
+    poids = np.where(en_deficit[:, None], poids, depart[:, None])
+    poids = np.maximum(objectif[:, None], poids).reshape(n, len(semaines))
+    poids[semaines[None, :] > horizon[:, None]] = np.nan
+
+    for a in (semaines, poids, semaines_est, horizon):
+        a.setflags(write=False)
+    return Projections(semaines, poids, semaines_est, horizon)
+
+
+def projection_adaptative(poids_depart, objectif, taille_cm, age, sexe, pa, calories_cible):
+    proj = projections_adaptatives([(poids_depart, objectif, taille_cm, age, sexe, pa, calories_cible)])
+    n = proj.horizon[0] + 1
+    return proj.semaines[:n], proj.poids[0, :n], float(proj.semaines_est[0])
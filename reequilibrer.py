@@ -0,0 +1,150 @@
+"""Rééquilibrage des utilisateurs entre classeurs (shards).
+
+Les shards sont ceux de [app] spreadsheet_id (shard "principal") et
+[app.shards]. Sans --user-id, chaque utilisateur est ramené sur le shard
+que lui donne l'anneau (après l'ajout d'un shard : ~1/N des utilisateurs).
+
+    python reequilibrer.py --credentials compte.json --shard principal=ID --shard s1=ID --epingler
+    python reequilibrer.py --credentials compte.json --shard principal=ID --shard s1=ID [--dry-run]
+    python reequilibrer.py --credentials compte.json --shard principal=ID --shard s1=ID --user-id moi --vers s1
+
+Ajout d'un shard, dans cet ordre :
+
+1. --epingler avec la nouvelle liste de shards : les utilisateurs que
+   l'anneau enverrait ailleurs sont inscrits dans la feuille "routage" sur
+   le shard où sont leurs lignes ;
+2. ajout du shard dans [app.shards] (les utilisateurs épinglés ne bougent
+   pas, les nouveaux suivent l'anneau) ;
+3. rééquilibrage : les lignes sont fusionnées à la destination, le
+   routage mis à jour, puis les lignes supprimées à la source. À lancer
+   app arrêtée, ou redémarrer l'app ensuite (table de routage en cache).
+
+Sans l'étape 1, l'app routerait ces utilisateurs vers le nouveau shard,
+vide, jusqu'au rééquilibrage. Un utilisateur déplacé avec --user-id reste
+où il a été mis (origine "manuel" dans la feuille "routage").
+"""
+import argparse
+import logging
+
+from partitions import (
+    EPINGLE, FEUILLE_ROUTAGE, MANUEL, PRINCIPAL, Routage, deplacer, ecrire_exceptions, lire_epingles,
+    lire_exceptions,
+)
+
+log = logging.getLogger(__name__)
+
+
+def _feuilles(classeurs):
+    return {nom: (sh.worksheet("profil"), sh.worksheet("poids")) for nom, sh in classeurs.items()}
+
+
+def emplacements(feuilles):
+    # user_id -> shards où il a au moins une ligne
+    places = {}
+    for nom, (ws_profil, ws_poids) in feuilles.items():
+        for ws in (ws_profil, ws_poids):
+            for r in ws.get_all_values()[1:]:
+                if r and r[0]:
+                    places.setdefault(r[0], set()).add(nom)
+    return places
+
+
+def plan(routage, places, user_id=None, vers=None, epingles=()):
+    # -> [(user_id, depuis, vers), ...] ; sans user_id, les utilisateurs
+    # placés à la main (exception hors `epingles`) ne bougent pas
+    if user_id is not None:
+        return [(user_id, depuis, vers) for depuis in sorted(places.get(user_id, ())) if depuis != vers]
+    return [(u, depuis, routage.anneau.shard(u))
+            for u, shards in sorted(places.items())
+            if u not in routage.exceptions or u in epingles
+            for depuis in sorted(shards) if depuis != routage.anneau.shard(u)]
+
+
+def epinglages(routage, places):
+    # -> {user_id: shard actuel} pour ceux que l'anneau enverrait ailleurs
+    # (déjà dans la table d'exceptions : laissés tels quels)
+    epingles = {}
+    for u, shards in sorted(places.items()):
+        if u in routage.exceptions or routage.anneau.shard(u) in shards:
+            continue
+        if len(shards) > 1:
+            log.warning("%s a des lignes sur %s : épinglé sur %s", u, sorted(shards), min(shards))
+        epingles[u] = min(shards)
+    return epingles
+
+
+def _feuille_routage(principal):
+    if FEUILLE_ROUTAGE not in {ws.title for ws in principal.worksheets()}:
+        principal.add_worksheet(title=FEUILLE_ROUTAGE, rows=1000, cols=3)
+    return principal.worksheet(FEUILLE_ROUTAGE)
+
+
+def epingler(classeurs, dry_run=False):
+    # avant d'ajouter un shard à la config de l'app (voir l'ordre ci-dessus)
+    principal = classeurs[PRINCIPAL]
+    routage = Routage({nom: nom for nom in classeurs}, lire_exceptions(principal))
+    epingles = epinglages(routage, emplacements(_feuilles(classeurs)))
+    if epingles and not dry_run:
+        ecrire_exceptions(_feuille_routage(principal), epingles, EPINGLE)
+    return epingles
+
+
+def reequilibrer(classeurs, user_id=None, vers=None, dry_run=False):
+    # classeurs: {shard: gspread.Spreadsheet (ou ClasseurMemoire)}
+    principal = classeurs[PRINCIPAL]
+    routage = Routage({nom: nom for nom in classeurs}, lire_exceptions(principal))
+    feuilles = _feuilles(classeurs)
+    mouvements = plan(routage, emplacements(feuilles), user_id, vers, lire_epingles(principal))
+    if dry_run or not mouvements:
+        return mouvements
+    ws_routage = _feuille_routage(principal)
+    origine = MANUEL if user_id is not None else EPINGLE
+    for u, depuis, cible in mouvements:
+        lignes = deplacer(u, feuilles[depuis], feuilles[cible], ws_routage, cible, origine)
+        print(f"{u} : {depuis} -> {cible} ({lignes['profil']} profil, {lignes['poids']} poids)")
+    return mouvements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Déplace des utilisateurs entre classeurs Google Sheets.")
+    parser.add_argument("--credentials", required=True, help="fichier JSON du compte de service")
+    parser.add_argument("--shard", action="append", required=True, metavar="NOM=SPREADSHEET_ID",
+                        help=f"un par classeur ; le shard {PRINCIPAL} est obligatoire")
+    parser.add_argument("--user-id", help="déplacer seulement cet utilisateur (avec --vers)")
+    parser.add_argument("--vers", help="shard de destination de --user-id")
+    parser.add_argument("--epingler", action="store_true",
+                        help="garde chaque utilisateur sur son shard actuel (avant d'ajouter un shard à l'app)")
+    parser.add_argument("--dry-run", action="store_true", help="affiche les déplacements sans écrire")
+    args = parser.parse_args(argv)
+
+    ids = dict(s.split("=", 1) for s in args.shard)
+    if PRINCIPAL not in ids:
+        parser.error(f"--shard {PRINCIPAL}=ID est obligatoire")
+    if bool(args.user_id) != bool(args.vers):
+        parser.error("--user-id et --vers vont ensemble")
+    if args.epingler and args.user_id:
+        parser.error("--epingler porte sur tous les utilisateurs")
+    if args.vers and args.vers not in ids:
+        parser.error(f"shard inconnu : {args.vers}")
+
+    import gspread
+
+    logging.basicConfig(level=logging.INFO)
+    gc = gspread.service_account(filename=args.credentials)
+    classeurs = {nom: gc.open_by_key(cle) for nom, cle in ids.items()}
+    if args.epingler:
+        epingles = epingler(classeurs, args.dry_run)
+        for u, shard in epingles.items():
+            print(f"{u} : épinglé sur {shard}")
+        print(f"{len(epingles)} utilisateur(s){' à épingler' if args.dry_run else ' épinglé(s)'}")
+        return
+    user_id = args.user_id.strip().lower() if args.user_id else None
+    mouvements = reequilibrer(classeurs, user_id, args.vers, args.dry_run)
+    if args.dry_run:
+        for u, depuis, cible in mouvements:
+            print(f"{u} : {depuis} -> {cible}")
+    print(f"{len(mouvements)} déplacement(s){' prévus' if args.dry_run else ''}")
+
+
+if __name__ == "__main__":
+    main()
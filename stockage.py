@@ -0,0 +1,1363 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date, timedelta
+
+log = logging.getLogger(__name__)
+
+POIDS_ENTETES = ["user_id", "date", "poids"]
+
+# Feuille profil : une ligne par user_id, une colonne typée par clé
+PROFIL_COLONNES = {
+    "poids_actuel": float,
+    "taille_cm": float,
+    "age": int,
+    "sexe": str,
+    "objectif": float,
+    "mode_deficit": str,
+    "deficit_perso": float,
+    "niveau_job": str,
+    "h_sport_faible": float,
+    "h_sport_moyenne": float,
+    "h_sport_forte": float,
+}
+PROFIL_ENTETES = ["user_id", *PROFIL_COLONNES]
+# borne des lectures partielles de la feuille profil (l'API ne renvoie que
+# les cellules remplies)
+PROFIL_DERNIERE_COLONNE = "ZZ"
+
+_TYPES_SQL = {float: "REAL", int: "INTEGER", str: "TEXT"}
+
+
+def _convertir(type_, valeur):
+    # "70.0" -> 70.0 ; "" -> None
+    if valeur is None or valeur == "":
+        return None
+    try:
+        return int(float(valeur)) if type_ is int else type_(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def _colonne(n: int) -> str:
+    # 1 -> "A", 27 -> "AA"
+    lettres = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        lettres = chr(65 + r) + lettres
+    return lettres
+
+# =========================
+# Feuille en mémoire (remplace gspread en test)
+# =========================
+def _cellule(a1: str):
+    # "C12" -> (12, 3) ; "A" seul -> (None, 1)
+    m = re.fullmatch(r"([A-Z]+)(\d*)", a1.split("!")[-1].upper())
+    col = 0
+    for c in m.group(1):
+        col = col * 26 + (ord(c) - 64)
+    return (int(m.group(2)) if m.group(2) else None), col
+
+
+class FeuilleMemoire:
+    """Même interface que gspread.Worksheet pour les appels utilisés par l'app."""
+
+    def __init__(self, lignes=None, titre=""):
+        self.title = titre
+        self.lignes = [[str(v) for v in r] for r in (lignes or [])]
+
+    def get_all_values(self):
+        return [list(r) for r in self.lignes]
+
+    def get(self, range_name=None, **kwargs):
+        debut, _, fin = (range_name or "A1").partition(":")
+        l0, c0 = _cellule(debut)
+        l1, c1 = _cellule(fin) if fin else (l0, c0)
+        l0 = l0 or 1
+        l1 = l1 or len(self.lignes)
+        return [r[c0 - 1:c1] for r in self.lignes[l0 - 1:l1]]
+
+    def batch_get(self, ranges, **kwargs):
+        return [self.get(r) for r in ranges]
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values])
+
+    def append_rows(self, values, **kwargs):
+        debut = len(self.lignes) + 1
+        for r in values:
+            self.lignes.append([str(v) for v in r])
+        fin = len(self.lignes)
+        return {"updates": {"updatedRange": f"{self.title}!A{debut}:C{fin}"}}
+
+    def update(self, values=None, range_name=None, **kwargs):
+        # accepte aussi l'ancien ordre update("C5", "70.2")
+        if isinstance(values, str) and (range_name is None or not isinstance(range_name, str) or _est_plage(values)):
+            values, range_name = range_name, values
+        if not isinstance(values, list):
+            values = [[values]]
+        self._ecrire(range_name or "A1", values)
+
+    def batch_update(self, data, **kwargs):
+        for bloc in data:
+            self._ecrire(bloc["range"], bloc["values"])
+
+    def clear(self):
+        self.lignes = []
+
+    def delete_rows(self, start_index, end_index=None):
+        del self.lignes[start_index - 1:end_index or start_index]
+
+    def _ecrire(self, plage, values):
+        ligne0, col0 = _cellule(plage.split(":")[0])
+        ligne0 = ligne0 or 1
+        for i, r in enumerate(values):
+            n = ligne0 + i
+            while len(self.lignes) < n:
+                self.lignes.append([])
+            ligne = self.lignes[n - 1]
+            for j, v in enumerate(r):
+                while len(ligne) < col0 + j:
+                    ligne.append("")
+                ligne[col0 + j - 1] = str(v)
+
+
+def _est_plage(s: str) -> bool:
+    return re.fullmatch(r"([^!]+!)?[A-Z]+\d*(:[A-Z]+\d*)?", s.upper()) is not None
+
+
+class ClasseurMemoire:
+    """Remplace gspread.Spreadsheet : .worksheet("profil") / .worksheet("poids")."""
+
+    def __init__(self, feuilles=None):
+        self.feuilles = feuilles or {
+            "profil": FeuilleMemoire(titre="profil"),
+            "poids": FeuilleMemoire(titre="poids"),
+        }
+
+    def worksheet(self, nom):
+        return self.feuilles[nom]
+
+    def worksheets(self):
+        return list(self.feuilles.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self.feuilles[title] = FeuilleMemoire(titre=title)
+        return self.feuilles[title]
+
+
+# =========================
+# Quota Sheets API : seau à jetons + comptage des appels
+# =========================
+class SeauJetons:
+    """`debit` jetons par seconde, au plus `capacite` en réserve (rafale).
+
+    Par défaut 50/min avec une rafale de 10 : jamais plus de 60 appels sur
+    une minute glissante (quota Sheets par utilisateur et par minute).
+    """
+
+    def __init__(self, debit=50 / 60, capacite=10, horloge=time.monotonic, dormir=time.sleep):
+        self.debit = debit
+        self.capacite = capacite
+        self._horloge = horloge
+        self._dormir = dormir
+        self._jetons = float(capacite)
+        self._t = horloge()
+        self._verrou = threading.Lock()
+
+    def prendre(self, n=1) -> float:
+        # bloque jusqu'à obtenir n jetons ; renvoie le temps attendu (s)
+        attendu = 0.0
+        while True:
+            with self._verrou:
+                t = self._horloge()
+                self._jetons = min(self.capacite, self._jetons + (t - self._t) * self.debit)
+                self._t = t
+                if self._jetons >= n:
+                    self._jetons -= n
+                    return attendu
+                attente = (n - self._jetons) / self.debit
+            self._dormir(attente)
+            attendu += attente
+
+
+class FeuilleLimitee:
+    """Enveloppe un worksheet : chaque appel API prend un jeton et est compté."""
+
+    APPELS = {"get", "get_all_values", "append_row", "append_rows", "update", "batch_update", "clear"}
+
+    def __init__(self, ws, seau, compter):
+        self._ws = ws
+        self._seau = seau
+        self._compter = compter
+
+    def __getattr__(self, nom):
+        attr = getattr(self._ws, nom)
+        if nom not in self.APPELS:
+            return attr
+
+        def appel(*args, **kwargs):
+            self._compter(nom, self._seau.prendre())
+            return attr(*args, **kwargs)
+        return appel
+
+
+# =========================
+# Journal local des écritures (hors ligne)
+# =========================
+class Journal:
+    """Fichier append-only (une op JSON par ligne, fsync à chaque ajout)
+    des écritures pas encore recopiées dans le Sheet.
+
+    Chaque op reçoit un numéro croissant ; une ligne {"ok": n} marque les
+    ops <= n comme recopiées. Au redémarrage, les ops non marquées sont
+    rejouées ; une dernière ligne tronquée (arrêt pendant l'écriture) est
+    ignorée. Appelé sous le verrou du miroir.
+    """
+
+    # une fois tout recopié, le fichier est réécrit au-delà de cette taille
+    taille_compactage = 1 << 20
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.dernier = 0      # dernier numéro attribué
+        self.acquitte = 0     # ops <= acquitte : dans le Sheet
+        self._a_rejouer = []
+        if os.path.exists(chemin):
+            self._relire()
+        self._f = open(chemin, "a", encoding="utf-8")
+
+    def _relire(self):
+        with open(self.chemin, "rb") as f:
+            contenu = f.read()
+        fin = contenu.rfind(b"\n") + 1
+        if fin < len(contenu):
+            # écriture interrompue : on coupe avant d'ajouter derrière
+            with open(self.chemin, "r+b") as f:
+                f.truncate(fin)
+        ops = []
+        for ligne in contenu[:fin].splitlines():
+            try:
+                entree = json.loads(ligne)
+            except ValueError:
+                continue
+            if "ok" in entree:
+                self.acquitte = max(self.acquitte, entree["ok"])
+            else:
+                ops.append((entree["n"], tuple(entree["op"])))
+        self.dernier = max([self.acquitte, *(n for n, _ in ops)])
+        self._a_rejouer = [op for n, op in ops if n > self.acquitte]
+
+    def a_rejouer(self) -> list:
+        # ops du journal absentes du Sheet au démarrage, dans l'ordre d'écriture
+        return list(self._a_rejouer)
+
+    def ajouter(self, ops):
+        lignes = []
+        for op in ops:
+            self.dernier += 1
+            lignes.append(json.dumps({"n": self.dernier, "op": op}, ensure_ascii=False))
+        self._ecrire(lignes)
+
+    def acquitter(self, n):
+        if n <= self.acquitte:
+            return
+        self.acquitte = n
+        self._a_rejouer = []
+        if n == self.dernier and self._f.tell() > self.taille_compactage:
+            self._compacter()
+        else:
+            self._ecrire([json.dumps({"ok": n})])
+
+    def _ecrire(self, lignes):
+        self._f.write("\n".join(lignes) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def _compacter(self):
+        # tout est dans le Sheet : le journal repart d'une seule ligne
+        temporaire = self.chemin + ".tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"ok": self.acquitte}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._f.close()
+        os.replace(temporaire, self.chemin)
+        self._f = open(self.chemin, "a", encoding="utf-8")
+
+    def en_attente(self) -> int:
+        return self.dernier - self.acquitte
+
+
+# =========================
+# Miroir Google Sheets (écritures en arrière-plan)
+# =========================
+class MiroirFeuilles:
+    """File d'écritures vers le Sheet, vidée par un thread, commune à toutes
+    les sessions du process.
+
+    Une op est un tuple (type, user_id, ..., valeur) ; tout sauf la valeur
+    sert de clé. Deux envois de même clé sont fusionnés (la valeur la plus
+    récente gagne, les dicts sont combinés). Le thread laisse les envois
+    s'accumuler pendant `fenetre` secondes, puis passe tout en un lot à
+    `appliquer` ; en cas d'échec le lot est retenté avec un délai croissant.
+    Les appels au Sheet passent par `limiter(ws)` (seau à jetons).
+
+    Avec un `journal`, chaque envoi y est écrit (fsync) avant d'être mis en
+    file, et un lot qui échoue n'est jamais abandonné : il est retenté
+    jusqu'à ce que le Sheet réponde, y compris après un redémarrage.
+    """
+
+    fenetre = 2.0
+    lot_max = 500
+    delai_retry = 1.0
+    delai_max = 60.0
+    tentatives_max = 6
+
+    def __init__(self, appliquer, asynchrone=True, seau=None, journal=None):
+        # appliquer: fonction([op, ...]) qui pousse un lot d'écritures dans le Sheet
+        self._appliquer = appliquer
+        self._asynchrone = asynchrone
+        self.journal = journal
+        self.seau = seau or SeauJetons()
+        self._cond = threading.Condition()
+        self._attente = OrderedDict()   # clé -> valeur, fusionnées
+        self._en_vol = {}               # lot en cours d'envoi
+        self._echecs = set()            # user_id dont le dernier lot a échoué tentatives_max fois
+        self._stats = Counter()
+        if asynchrone:
+            threading.Thread(target=self._boucle, name="miroir-feuilles", daemon=True).start()
+
+    def envoyer(self, op):
+        with self._cond:
+            self._stats["ops"] += 1
+            if not self._asynchrone:
+                self._stats["lots"] += 1
+            else:
+                if self.journal is not None:
+                    self.journal.ajouter([op])
+                self._stats["fusions"] += op[:-1] in self._attente
+                self._fusionner(op[:-1], op[-1])
+                self._cond.notify_all()
+                return
+        self._appliquer([op])
+
+    def envoyer_lot(self, ops):
+        # import en masse : toutes les ops partent dans le même lot
+        if not ops:
+            return
+        with self._cond:
+            self._stats["ops"] += len(ops)
+            if not self._asynchrone:
+                self._stats["lots"] += 1
+            else:
+                if self.journal is not None:
+                    self.journal.ajouter(ops)  # un seul fsync pour le lot
+                for op in ops:
+                    self._stats["fusions"] += op[:-1] in self._attente
+                    self._fusionner(op[:-1], op[-1])
+                self._cond.notify_all()
+                return
+        self._appliquer(list(ops))
+
+    def reprendre(self, ops):
+        # ops relues dans le journal au démarrage : remises en file telles quelles
+        with self._cond:
+            for op in ops:
+                self._fusionner(op[:-1], op[-1])
+            self._cond.notify_all()
+
+    def limiter(self, ws):
+        return FeuilleLimitee(ws, self.seau, self._compter)
+
+    def _compter(self, nom, attendu):
+        with self._cond:
+            self._stats["appels"] += 1
+            self._stats[f"appels_{nom}"] += 1
+            self._stats["attente_quota_s"] += attendu
+
+    def metriques(self) -> dict:
+        # sans lot ni fusion, chaque sauvegarde coûtait au moins 2 appels
+        # (lecture complète + écriture)
+        with self._cond:
+            m = dict(self._stats)
+            m["en_attente"] = len(self._attente) + len(self._en_vol)
+            if self.journal is not None:
+                m["journal_en_attente"] = self.journal.en_attente()
+        m["appels_sans_lot"] = 2 * m.get("ops", 0)
+        m["appels_economises"] = m["appels_sans_lot"] - m.get("appels", 0)
+        return m
+
+    def _fusionner(self, cle, valeur, avant=False):
+        ancienne = self._attente.get(cle)
+        if isinstance(ancienne, dict) and isinstance(valeur, dict):
+            valeur = {**valeur, **ancienne} if avant else {**ancienne, **valeur}
+        elif ancienne is not None and avant:
+            return  # une valeur plus récente attend déjà
+        self._attente[cle] = valeur
+
+    def etat(self, user_id) -> str:
+        # "en_attente" | "hors_ligne" (gardé dans le journal, retenté) | "echec" | "ok"
+        with self._cond:
+            if any(cle[1] == user_id for cle in (*self._attente, *self._en_vol)):
+                return "hors_ligne" if user_id in self._echecs else "en_attente"
+            return "echec" if user_id in self._echecs else "ok"
+
+    def repere(self):
+        # (nombre d'envois, file vide) : voir StockageLocal.charger_depuis_feuilles
+        with self._cond:
+            return self._stats["ops"], not self._attente and not self._en_vol
+
+    def attendre(self, timeout=None):
+        # bloque jusqu'à ce que toutes les écritures soient dans le Sheet
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._attente and not self._en_vol, timeout)
+
+    def _boucle(self):
+        tentative = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._attente)
+                # fenêtre de regroupement : les autres sessions ajoutent au lot
+                self._cond.wait_for(lambda: len(self._attente) >= self.lot_max, self.fenetre)
+                self._en_vol, self._attente = self._attente, OrderedDict()
+                # toutes les ops journalisées jusqu'ici sont dans ce lot
+                numero = self.journal.dernier if self.journal is not None else 0
+                lot = [(*cle, valeur) for cle, valeur in self._en_vol.items()]
+                self._stats["lots"] += 1
+                self._stats["ops_envoyees"] += len(lot)
+            try:
+                self._appliquer(lot)
+            except Exception:
+                tentative += 1
+                # avec un journal, rien n'est abandonné (retenté toutes les delai_max s)
+                abandon = self.journal is None and tentative >= self.tentatives_max
+                log.exception("Écriture Google Sheets échouée (%s op, tentative %s)%s",
+                              len(lot), tentative, ", abandon" if abandon else "")
+                with self._cond:
+                    self._stats["echecs"] += 1
+                    if tentative >= self.tentatives_max:
+                        self._echecs.update(cle[1] for cle in self._en_vol)
+                    if abandon:
+                        self._stats["abandons"] += 1
+                    else:
+                        for cle, valeur in reversed(self._en_vol.items()):
+                            self._fusionner(cle, valeur, avant=True)
+                            self._attente.move_to_end(cle, last=False)
+                    self._en_vol = {}
+                    self._cond.notify_all()
+                if abandon:
+                    tentative = 0
+                else:
+                    time.sleep(min(self.delai_max, self.delai_retry * 2 ** (tentative - 1)))
+                continue
+            tentative = 0
+            with self._cond:
+                if self.journal is not None:
+                    self.journal.acquitter(numero)
+                self._echecs.difference_update(cle[1] for cle in self._en_vol)
+                self._en_vol = {}
+                self._cond.notify_all()
+
+
+def _ligne_ajoutee(reponse):
+    # append_row renvoie {"updates": {"updatedRange": "poids!A12:C12"}}
+    try:
+        plage = reponse["updates"]["updatedRange"]
+    except (TypeError, KeyError):
+        return None
+    return _cellule(plage.split(":")[0])[0]
+
+
+def profil_diff(rows, user_id, data):
+    # rows: get_all_values() de la feuille profil (user_id | key | value)
+    # -> (cellules à modifier [(ligne, valeur)], nouvelles lignes à ajouter)
+    index = {}
+    for idx, r in enumerate(rows[1:], start=2):
+        if len(r) >= 3 and r[0] == user_id:
+            index[r[1]] = (idx, r[2])  # doublons : la dernière ligne gagne, comme à la lecture
+    maj, ajouts = [], []
+    for k, v in data.items():
+        v = str(v)
+        if k not in index:
+            ajouts.append([user_id, k, v])
+        elif index[k][1] != v:
+            maj.append((index[k][0], v))
+    return maj, ajouts
+
+
+# =========================
+# Accès direct au Sheet, sans copie locale (app_multiUsers.py)
+# Chaque appel relit la feuille entière (get_all_values).
+# =========================
+def feuille_profil_lire(ws_profil, user_id) -> dict:
+    data = {}
+    for r in ws_profil.get_all_values()[1:]:
+        if len(r) >= 3 and r[0] == user_id:
+            data[r[1]] = r[2]
+    return data
+
+
+def feuille_profil_ecrire(ws_profil, user_id, data):
+    rows = ws_profil.get_all_values()
+    if len(rows) == 0:
+        ws_profil.append_row(["user_id", "key", "value"])
+        rows = ws_profil.get_all_values()
+
+    # cellules modifiées en 1 batch_update, nouvelles clés en 1 append_rows
+    maj, ajouts = profil_diff(rows, user_id, data)
+    if maj:
+        ws_profil.batch_update([{"range": f"C{rownum}", "values": [[v]]} for rownum, v in maj])
+    if ajouts:
+        ws_profil.append_rows(ajouts)
+
+
+def feuille_poids_lire(ws_poids, user_id) -> list:
+    # -> [(date_iso, poids)] triées par date ; poids illisibles ignorés
+    mesures = []
+    for r in ws_poids.get_all_values()[1:]:
+        if len(r) >= 3 and r[0] == user_id:
+            try:
+                mesures.append((r[1], float(r[2])))
+            except ValueError:
+                continue
+    return sorted(mesures, key=lambda m: m[0])
+
+
+def feuille_poids_ecrire(ws_poids, user_id, date_iso, poids):
+    rows = ws_poids.get_all_values()
+    if len(rows) == 0:
+        ws_poids.append_row(POIDS_ENTETES)
+        rows = ws_poids.get_all_values()
+
+    for idx, r in enumerate(rows[1:], start=2):
+        if len(r) >= 3 and r[0] == user_id and r[1] == date_iso:
+            ws_poids.update(f"C{idx}", str(poids))
+            return
+    ws_poids.append_row([user_id, date_iso, str(poids)])
+
+
+# Ancien format app_multiUsers.py : une intensité + un total d'heures
+_INTENSITE_SPORT = {
+    "Faible (0.02 × h/sem)": "h_sport_faible",
+    "Moyenne (0.04 × h/sem)": "h_sport_moyenne",
+    "Forte (0.06 × h/sem)": "h_sport_forte",
+}
+
+
+def profil_migrer_lignes(rows, user_id=None, colonnes=PROFIL_COLONNES):
+    """Convertit une feuille profil clé/valeur en une ligne par utilisateur.
+
+    Formats acceptés : user_id | key | value (apps multi-utilisateurs) et
+    key | value (app.py, un seul utilisateur : user_id obligatoire).
+    Renvoie (lignes au format large, clés ignorées).
+    """
+    entetes = [c.strip() for c in rows[0]] if rows else []
+    if entetes[:1] == ["user_id"] and entetes[1:3] != ["key", "value"]:
+        return [list(r) for r in rows], set()  # déjà au format large
+
+    if entetes[:3] == ["user_id", "key", "value"]:
+        triplets = [(r[0], r[1], r[2]) for r in rows[1:] if len(r) >= 3]
+    elif entetes[:2] == ["key", "value"]:
+        if not user_id:
+            raise ValueError("Feuille profil à 2 colonnes (app.py) : préciser le user_id.")
+        triplets = [(user_id, r[0], r[1]) for r in rows[1:] if len(r) >= 2]
+    elif not rows:
+        triplets = []
+    else:
+        raise ValueError(f"Format de feuille profil inconnu : {entetes}")
+
+    profils, ignorees = {}, set()
+    for u, k, v in triplets:
+        profils.setdefault(u, {})[k] = v
+    for data in profils.values():
+        intensite = data.pop("intensite_sport", None)
+        heures = data.pop("heures_sport", None)
+        if intensite in _INTENSITE_SPORT and heures is not None:
+            data.setdefault(_INTENSITE_SPORT[intensite], heures)
+        ignorees.update(k for k in data if k not in colonnes)
+
+    lignes = [["user_id", *colonnes]]
+    for u, data in profils.items():
+        ligne = [u]
+        for k, type_ in colonnes.items():
+            v = _convertir(type_, data.get(k))
+            ligne.append("" if v is None else str(v))
+        lignes.append(ligne)
+    return lignes, ignorees
+
+
+# =========================
+# Cache par user_id (LRU)
+# =========================
+class CacheUtilisateurs:
+    """Cache LRU par user_id : une écriture n'invalide que l'utilisateur concerné."""
+
+    def __init__(self, charger, taille_max=500):
+        self._charger = charger
+        self._taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        # générations : une écriture pendant un chargement le rend périmé
+        self._generations = Counter()
+        self._vidages = 0
+        self.succes = 0
+        self.echecs = 0
+
+    def _generation(self, user_id):
+        return self._vidages, self._generations[user_id]
+
+    def lire(self, user_id):
+        with self._verrou:
+            if user_id in self._entrees:
+                self.succes += 1
+                self._entrees.move_to_end(user_id)
+                return self._entrees[user_id]
+            self.echecs += 1
+            generation = self._generation(user_id)
+        # chargement hors verrou : modifier / invalider peuvent passer entre-temps
+        valeur = self._charger(user_id)
+        with self._verrou:
+            if self._generation(user_id) != generation:
+                return valeur  # pas gardé : la prochaine lecture rechargera
+            self._entrees[user_id] = valeur
+            self._entrees.move_to_end(user_id)
+            while len(self._entrees) > self._taille_max:
+                self._entrees.popitem(last=False)
+        return valeur
+
+    def modifier(self, user_id, appliquer):
+        # Applique la valeur écrite à l'entrée en cache (pas de rechargement).
+        # Si l'utilisateur n'est pas en cache, rien à faire : la prochaine
+        # lecture chargera la version à jour.
+        with self._verrou:
+            self._generations[user_id] += 1
+            if user_id in self._entrees:
+                self._entrees[user_id] = appliquer(self._entrees[user_id])
+
+    def invalider(self, user_id):
+        with self._verrou:
+            self._generations[user_id] += 1
+            self._entrees.pop(user_id, None)
+
+    def vider(self):
+        with self._verrou:
+            self._vidages += 1
+            self._generations.clear()
+            self._entrees.clear()
+
+    def rafraichir(self, touches):
+        # abonné à StockageLocal.synchroniser : touches = user_id modifiés, None = tout
+        if touches is None:
+            self.vider()
+        for user_id in touches or ():
+            self.invalider(user_id)
+
+    def stats(self) -> dict:
+        total = self.succes + self.echecs
+        return {"succes": self.succes, "echecs": self.echecs, "entrees": len(self._entrees),
+                "taux_succes": self.succes / total if total else 0.0}
+
+    def __len__(self):
+        return len(self._entrees)
+
+
+# =========================
+# Index (clé) -> ligne Sheet
+# =========================
+class IndexLignes:
+    """Numéros de ligne Sheet, gardés dans la colonne `ligne` d'une table locale.
+
+    Mis à jour à chaque ajout ; reconstruit (1 get_all_values) quand un ajout
+    atterrit ailleurs que prévu ou quand une ligne vérifiée ne correspond plus.
+    `controle` = (lettre, colonne) : colonne relue en entier à chaque
+    synchronisation pour voir les cellules modifiées à la main.
+    """
+
+    def __init__(self, stockage, table, colonnes, controle=None):
+        self._s = stockage
+        self._table = table
+        self._colonnes = colonnes
+        self._controle = controle
+        self.entete = []
+        self._where = " AND ".join(f"{c} = ?" for c in colonnes)
+        self.nb_lignes = int(stockage._meta(f"{table}_nb_lignes", 0))
+        self.verifie_a = 0.0
+
+    def ligne(self, *cle):
+        with self._s._verrou:
+            row = self._s._db.execute(
+                f"SELECT ligne FROM {self._table} WHERE {self._where}", cle
+            ).fetchone()
+        return row[0] if row else None
+
+    def a_verifier(self):
+        return time.monotonic() - self.verifie_a > self._s.verification_ttl
+
+    def fixer(self, cle, ligne):
+        with self._s._verrou, self._s._db:
+            self._s._db.execute(
+                f"UPDATE {self._table} SET ligne = ? WHERE {self._where}", (ligne, *cle)
+            )
+            self._fixer_nb_lignes(max(self.nb_lignes, ligne))
+
+    def _fixer_nb_lignes(self, n):
+        self.nb_lignes = n
+        self._s._meta_ecrire(f"{self._table}_nb_lignes", n)
+
+    def apres_ajout(self, ws, cles, reponse):
+        # cles: clés des lignes ajoutées, dans l'ordre
+        attendue = self.nb_lignes + 1
+        premiere = _ligne_ajoutee(reponse) or attendue
+        for i, cle in enumerate(cles):
+            self.fixer(cle, premiere + i)
+        if premiere != attendue:
+            # des lignes ont été ajoutées/supprimées à la main : index à refaire
+            log.warning("Index %s désynchronisé (ligne %s au lieu de %s), reconstruction",
+                        self._table, premiere, attendue)
+            self.reconstruire(ws.get_all_values())
+        else:
+            self.verifie_a = time.monotonic()
+
+    def lignes_ajoutees(self, ws, derniere_colonne, entete=False):
+        # Lignes au-delà de nb_lignes, avec la ligne nb_lignes relue au passage
+        # (1 batch_get, avec la colonne de contrôle et, si entete, la ligne 1
+        # gardée dans self.entete). None si cette ligne n'est plus celle de
+        # l'index ou si une cellule contrôlée a changé.
+        n = self.nb_lignes
+        plages = [f"A{n}:{derniere_colonne}{n}", f"A{n + 1}:{derniere_colonne}"]
+        if entete:
+            plages.append(f"A1:{derniere_colonne}1")
+        if self._controle and n > 1:
+            plages.append(f"{self._controle[0]}2:{self._controle[0]}{n}")
+        derniere, nouvelles, *autres = ws.batch_get(plages)
+        if entete:
+            lue = autres.pop(0)
+            self.entete = [c.strip() for c in lue[0]] if lue else []
+        controle = autres
+        with self._s._verrou:
+            attendue = self._s._db.execute(
+                f"SELECT {', '.join(self._colonnes)} FROM {self._table} WHERE ligne = ?", (n,)
+            ).fetchone()
+        if not derniere or (attendue is not None and list(derniere[0][:len(self._colonnes)]) != list(attendue)):
+            log.warning("Feuille %s modifiée (ligne %s)", self._table, n)
+            return None
+        if controle and not self._controle_ok(controle[0]):
+            log.warning("Feuille %s modifiée (colonne %s)", self._table, self._controle[0])
+            return None
+        return nouvelles
+
+    def _controle_ok(self, cellules):
+        # cellules : colonne de contrôle, lignes 2..nb_lignes. Les écritures
+        # locales pas encore recopiées dans le Sheet ne comptent pas.
+        with self._s._verrou:
+            locales = self._s._db.execute(
+                f"SELECT ligne, user_id, {self._controle[1]} FROM {self._table} WHERE ligne IS NOT NULL"
+            ).fetchall()
+        for ligne, user_id, valeur in locales:
+            cellule = cellules[ligne - 2] if ligne - 2 < len(cellules) else []
+            try:
+                egal = float(cellule[0]) == valeur
+            except (IndexError, ValueError):
+                egal = False
+            if not egal and self._s.miroir.etat(user_id) not in ("en_attente", "hors_ligne"):
+                return False
+        return True
+
+    def reconstruire(self, rows):
+        # Renumérote les clés connues et importe les lignes ajoutées par
+        # d'autres process (inconnues de la copie locale).
+        n = len(self._colonnes)
+        index = {}
+        for idx, r in enumerate(rows[1:], start=2):
+            if len(r) >= n:
+                index.setdefault(tuple(r[:n]), idx)
+        with self._s._verrou, self._s._db:
+            self._s._db.execute(f"UPDATE {self._table} SET ligne = NULL")
+            self._s._db.executemany(
+                f"UPDATE {self._table} SET ligne = ? WHERE {self._where}",
+                [(idx, *cle) for cle, idx in index.items()],
+            )
+            connues = set(self._s._db.execute(f"SELECT {', '.join(self._colonnes)} FROM {self._table}"))
+            touches = self._s._importer(
+                self._table, [(idx, rows[idx - 1]) for cle, idx in index.items() if cle not in connues]
+            )
+            self._fixer_nb_lignes(len(rows))
+        self.verifie_a = time.monotonic()
+        self._s._notifier(touches)
+
+
+# =========================
+# Résumé par utilisateur (indicateurs du suivi)
+# =========================
+def _jour(date_iso: str) -> int:
+    try:
+        return date.fromisoformat(date_iso).toordinal()
+    except ValueError:
+        return 0
+
+
+def _date_moins(date_iso: str, jours: int) -> str:
+    # date saisie à la main dans le Sheet (non ISO) : fenêtre réduite au jour
+    try:
+        return (date.fromisoformat(date_iso) - timedelta(days=jours)).isoformat()
+    except ValueError:
+        return date_iso
+
+
+def _resumes(poids_rows, jours=7):
+    # (user_id, date, poids, ...) -> une ligne de la table resume par user_id
+    par_user = {}
+    for user_id, date_iso, poids, *_ in poids_rows:
+        par_user.setdefault(user_id, []).append((date_iso, poids))
+    for user_id, mesures in par_user.items():
+        mesures.sort()
+        valeurs = [p for _, p in mesures]
+        debut = _date_moins(mesures[-1][0], jours - 1)
+        fenetre = [p for d, p in mesures if d >= debut]
+        yield (
+            user_id, len(mesures), *mesures[0], *mesures[-1],
+            min(valeurs), max(valeurs), sum(fenetre), len(fenetre),
+        )
+
+
+# =========================
+# Stockage local SQLite (lectures par user_id)
+# =========================
+class StockageLocal:
+    """Copie locale des feuilles profil/poids.
+
+    Les lectures sont des requêtes indexées sur user_id ; les écritures vont
+    d'abord dans SQLite puis sont recopiées dans le Sheet par le miroir.
+    Chaque table garde aussi le numéro de ligne Sheet de ses entrées :
+    une sauvegarde = des appels ciblés, jamais de lecture complète.
+    """
+
+    SCHEMA_VERSION = 5
+    # fenêtre (jours calendaires) de la moyenne tenue dans la table resume
+    jours_resume = 7
+    # au-delà, l'index est revérifié (1 lecture ciblée) avant un update
+    verification_ttl = 600.0
+    # relecture des lignes ajoutées au Sheet par d'autres (au plus toutes les
+    # sync_ttl s) ; relecture complète toutes les resync_ttl s
+    sync_ttl = 30.0
+    resync_ttl = 3600.0
+
+    def __init__(self, feuilles, chemin=":memory:", asynchrone=True, colonnes_profil=PROFIL_COLONNES, journal=None):
+        self._feuilles = feuilles
+        self._verrou = threading.RLock()
+        # sérialise écritures du miroir et synchronisation (index de lignes)
+        self._verrou_sync = threading.Lock()
+        self._sync_a = self._resync_a = 0.0
+        self._ecritures = 0  # écritures locales, pour détecter celles faites pendant un rechargement
+        self._abonnes = []
+        self._db = sqlite3.connect(chemin, check_same_thread=False)
+        self.colonnes_profil = dict(colonnes_profil)
+        # ordre des colonnes dans la feuille (peut différer de colonnes_profil)
+        self._profil_entetes = ["user_id", *self.colonnes_profil]
+        self._creer_tables()
+        self.index_profil = IndexLignes(self, "profil", ("user_id",))
+        self.index_poids = IndexLignes(self, "poids", ("user_id", "date"), controle=("C", "poids"))
+        # journal: chemin du Journal des écritures (mode hors ligne), ou None
+        self.miroir = MiroirFeuilles(
+            self._appliquer, asynchrone=asynchrone, journal=Journal(journal) if journal else None
+        )
+
+    def _creer_tables(self):
+        colonnes = ", ".join(f"{k} {_TYPES_SQL[t]}" for k, t in self.colonnes_profil.items())
+        with self._verrou, self._db:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            existantes = [r[1] for r in self._db.execute("PRAGMA table_info(profil)")]
+            if version != self.SCHEMA_VERSION or (existantes and existantes[1:-1] != list(self.colonnes_profil)):
+                # simple copie du Sheet : on repart de zéro
+                self._db.executescript("DROP TABLE IF EXISTS profil; DROP TABLE IF EXISTS poids; DROP TABLE IF EXISTS meta; "
+                    "DROP TABLE IF EXISTS resume;")
+            self._db.executescript(
+                f"""
+                CREATE TABLE IF NOT EXISTS profil (
+                    user_id TEXT PRIMARY KEY, {colonnes}, ligne INTEGER
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS poids (
+                    user_id TEXT NOT NULL, date TEXT NOT NULL, poids REAL NOT NULL,
+                    ligne INTEGER,
+                    PRIMARY KEY (user_id, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS resume (
+                    user_id TEXT PRIMARY KEY, nb INTEGER NOT NULL,
+                    premier_date TEXT NOT NULL, premier_poids REAL NOT NULL,
+                    dernier_date TEXT NOT NULL, dernier_poids REAL NOT NULL,
+                    poids_min REAL NOT NULL, poids_max REAL NOT NULL,
+                    somme_fenetre REAL NOT NULL, nb_fenetre INTEGER NOT NULL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (
+                    cle TEXT PRIMARY KEY, valeur TEXT NOT NULL
+                );
+                """
+            )
+            self._db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _meta(self, cle, defaut=None):
+        row = self._db.execute("SELECT valeur FROM meta WHERE cle = ?", (cle,)).fetchone()
+        return row[0] if row else defaut
+
+    def _meta_ecrire(self, cle, valeur):
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (cle, str(valeur)))
+
+    def ouvrir(self):
+        # Démarrage : copie du Sheet, ou à défaut la copie locale d'un
+        # précédent process (Sheet injoignable), puis les écritures du
+        # journal qui n'y étaient pas encore.
+        try:
+            self.charger_depuis_feuilles()
+        except ValueError:
+            raise  # feuille au mauvais format : la copie locale n'y change rien
+        except Exception:
+            if not self.index_poids.nb_lignes:
+                raise
+            log.exception("Google Sheets injoignable : démarrage sur la copie locale")
+        if self.miroir.journal is not None:
+            ops = self.miroir.journal.a_rejouer()
+            if ops:
+                log.warning("Journal : %s écriture(s) à recopier dans le Sheet", len(ops))
+                self._rejouer(ops)
+                self.miroir.reprendre(ops)
+
+    def _rejouer(self, ops):
+        # ops du journal -> copie locale (même effet que profil_ecrire / poids_ecrire)
+        touches = set()
+        with self._verrou, self._db:
+            for op in ops:
+                if op[0] == "profil":
+                    self._profil_upsert(op[1], {k: v for k, v in op[2].items() if k in self.colonnes_profil})
+                else:
+                    self._poids_upsert([op[1:]])
+                touches.add(op[1])
+            self._resume_recalculer(touches)
+            self._ecritures += 1
+
+    def charger_depuis_feuilles(self):
+        # Un seul get_all_values par feuille, au démarrage du process.
+        # -> False (copie locale laissée telle quelle) si une écriture locale
+        # attendait le miroir au départ ou est arrivée pendant le
+        # téléchargement : le contenu lu ne la contient peut-être pas.
+        with self._verrou:
+            ecritures = self._ecritures
+        envois, file_vide = self.miroir.repere()
+        if not file_vide:
+            return False
+        ws_profil, ws_poids = self._feuilles()
+        rows_profil = self._profil_verifier(ws_profil.get_all_values())
+        if rows_profil:
+            self._profil_entetes = [c.strip() for c in rows_profil[0]]
+        profil_rows = {}
+        for idx, r in enumerate(rows_profil[1:], start=2):
+            if r and r[0] and r[0] not in profil_rows:
+                profil_rows[r[0]] = self._profil_ligne(r, idx)
+
+        rows_poids = ws_poids.get_all_values()
+        poids_rows = {}
+        for idx, r in enumerate(rows_poids[1:], start=2):
+            if len(r) < 3 or (r[0], r[1]) in poids_rows:
+                continue
+            try:
+                poids_rows[(r[0], r[1])] = (r[0], r[1], float(r[2]), idx)
+            except ValueError:
+                continue
+
+        marques = ", ".join("?" * (len(self.colonnes_profil) + 2))
+        with self._verrou, self._db:
+            if self._ecritures != ecritures or self.miroir.repere() != (envois, True):
+                return False
+            self._db.execute("DELETE FROM profil")
+            self._db.execute("DELETE FROM poids")
+            self._db.executemany(f"INSERT INTO profil VALUES ({marques})", profil_rows.values())
+            self._db.executemany("INSERT INTO poids VALUES (?, ?, ?, ?)", poids_rows.values())
+            self._db.execute("DELETE FROM resume")
+            self._db.executemany(
+                "INSERT INTO resume VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _resumes(poids_rows.values(), self.jours_resume),
+            )
+            self.index_profil._fixer_nb_lignes(len(rows_profil))
+            self.index_poids._fixer_nb_lignes(len(rows_poids))
+        self.index_profil.verifie_a = self.index_poids.verifie_a = time.monotonic()
+        self._sync_a = self._resync_a = time.monotonic()
+        return True
+
+    def synchroniser(self, force=False):
+        """Relit uniquement les lignes ajoutées aux feuilles depuis la dernière
+        lecture (A{n+1}:…), en vérifiant au passage la ligne n : 1 batch_get
+        par feuille.
+
+        Renvoie les user_id dont le profil ou l'historique a changé, ou None
+        après une relecture complète (ligne n différente, poids modifié à la
+        main dans la colonne C, ou resync_ttl écoulé : seul moyen de voir une
+        autre cellule modifiée à la main). Les abonnés (voir abonner)
+        reçoivent le même résultat.
+        """
+        maintenant = time.monotonic()
+        with self._verrou_sync:
+            if not force and maintenant - self._sync_a < self.sync_ttl:
+                return set()
+            self._sync_a = maintenant
+            if self.index_poids.nb_lignes == 0 or maintenant - self._resync_a > self.resync_ttl:
+                return self._notifier(self._resynchroniser())
+
+            ws_profil, ws_poids = self._feuilles()
+            nouvelles_poids = self.index_poids.lignes_ajoutees(ws_poids, "C")
+            nouvelles_profil = []
+            if self.index_profil.nb_lignes and nouvelles_poids is not None:
+                # en-tête relu dans le même appel : une autre instance a pu
+                # y ajouter des colonnes
+                nouvelles_profil = self.index_profil.lignes_ajoutees(ws_profil, PROFIL_DERNIERE_COLONNE, entete=True)
+                if nouvelles_profil is not None and self.index_profil.entete:
+                    self._profil_entetes = self.index_profil.entete
+            if nouvelles_poids is None or nouvelles_profil is None:
+                return self._notifier(self._resynchroniser())
+
+            with self._verrou, self._db:
+                n = self.index_poids.nb_lignes
+                touches = self._importer("poids", enumerate(nouvelles_poids, start=n + 1))
+                self.index_poids._fixer_nb_lignes(n + len(nouvelles_poids))
+                m = self.index_profil.nb_lignes
+                touches |= self._importer("profil", enumerate(nouvelles_profil, start=m + 1))
+                if nouvelles_profil:
+                    self.index_profil._fixer_nb_lignes(m + len(nouvelles_profil))
+            return self._notifier(touches)
+
+    def _importer(self, table, lignes):
+        # lignes: [(n° de ligne Sheet, valeurs)] écrites par d'autres process
+        # -> insérées dans la copie locale ; renvoie les user_id touchés
+        touches = set()
+        marques = ", ".join("?" * (len(self.colonnes_profil) + 2))
+        for idx, r in lignes:
+            if table == "poids":
+                if len(r) < 3:
+                    continue
+                try:
+                    valeurs = (r[0], r[1], float(r[2]), idx)
+                except ValueError:
+                    continue
+                cle, index = (r[0], r[1]), self.index_poids
+                existe = self._db.execute("SELECT ligne FROM poids WHERE user_id = ? AND date = ?", cle).fetchone()
+            else:
+                if not r or not r[0]:
+                    continue
+                cle, index = (r[0],), self.index_profil
+                existe = self._db.execute("SELECT ligne FROM profil WHERE user_id = ?", cle).fetchone()
+            if existe is None:
+                if table == "poids":
+                    self._db.execute("INSERT INTO poids VALUES (?, ?, ?, ?)", valeurs)
+                else:
+                    self._db.execute(f"INSERT INTO profil VALUES ({marques})", self._profil_ligne(r, idx))
+                touches.add(r[0])
+            elif existe[0] is None:
+                # notre propre écriture, pas encore indexée par le miroir
+                index.fixer(cle, idx)
+        if table == "poids":
+            self._resume_recalculer(touches)
+        return touches
+
+    def abonner(self, rappel):
+        # rappel(touches) après chaque synchronisation qui a changé quelque chose
+        self._abonnes.append(rappel)
+
+    def _notifier(self, touches):
+        if touches is None or touches:
+            for rappel in self._abonnes:
+                rappel(touches)
+        return touches
+
+    def demarrer_synchronisation(self):
+        # Un seul thread par process (le stockage est partagé par toutes les
+        # sessions) : N sessions actives = 1 lecture toutes les sync_ttl s.
+        def boucle():
+            while True:
+                time.sleep(self.sync_ttl)
+                try:
+                    self.synchroniser(force=True)
+                except Exception:
+                    log.exception("Synchronisation Google Sheets échouée")
+
+        threading.Thread(target=boucle, name="synchro-feuilles", daemon=True).start()
+
+    def _resynchroniser(self):
+        # pas de relecture complète tant que des écritures locales attendent
+        # d'être recopiées : elles seraient écrasées par l'ancien contenu
+        # (retentée à la synchronisation suivante)
+        if not self.charger_depuis_feuilles():
+            return set()
+        return None
+
+    def _profil_ligne(self, r, idx):
+        # ligne de la feuille (ordre _profil_entetes) -> ligne de la table profil
+        valeurs = {k: _convertir(self.colonnes_profil[k], r[i] if i < len(r) else "")
+                   for i, k in enumerate(self._profil_entetes) if k in self.colonnes_profil}
+        return (r[0], *(valeurs.get(k) for k in self.colonnes_profil), idx)
+
+    @staticmethod
+    def _profil_verifier(rows):
+        # Pas de migration implicite : la feuille peut encore servir à
+        # app_multiUsers.py (user_id | key | value).
+        entetes = [c.strip() for c in rows[0][:3]] if rows else []
+        if entetes == ["user_id", "key", "value"] or entetes[:2] == ["key", "value"]:
+            raise ValueError(
+                f"Feuille profil à l'ancien format ({' | '.join(entetes)}) : "
+                "la convertir d'abord avec migrer_profil.py."
+            )
+        return rows
+
+    # ---- PROFIL ----
+    def profil_lire(self, user_id: str) -> dict:
+        # Une seule ligne ; valeurs déjà typées, clés absentes = non renseignées
+        with self._verrou:
+            curseur = self._db.execute("SELECT * FROM profil WHERE user_id = ?", (user_id,))
+            row = curseur.fetchone()
+        if row is None:
+            return {}
+        noms = [c[0] for c in curseur.description]
+        return {k: v for k, v in zip(noms[1:-1], row[1:-1]) if v is not None}
+
+    def profil_ecrire(self, user_id: str, data: dict) -> dict:
+        data = {k: _convertir(self.colonnes_profil[k], v) for k, v in data.items() if k in self.colonnes_profil}
+        with self._verrou, self._db:
+            # diff avec l'état actuel : seules les valeurs modifiées partent au Sheet
+            actuel = self.profil_lire(user_id)
+            diff = {k: v for k, v in data.items() if v is not None and actuel.get(k) != v}
+            self._profil_upsert(user_id, diff)
+            self._ecritures += 1
+        if diff:
+            self.miroir.envoyer(("profil", user_id, diff))
+        return {**actuel, **diff}
+
+    def _profil_upsert(self, user_id, valeurs):
+        if not valeurs:
+            return
+        self._db.execute(
+            f"""
+            INSERT INTO profil (user_id, {", ".join(valeurs)}) VALUES (?{", ?" * len(valeurs)})
+            ON CONFLICT (user_id) DO UPDATE SET
+            {", ".join(f"{k} = excluded.{k}" for k in valeurs)}
+            """,
+            (user_id, *valeurs.values()),
+        )
+
+    # ---- POIDS ----
+    def poids_lire(self, user_id: str) -> list:
+        # [(date_iso, poids), ...] trié par date (clé primaire)
+        with self._verrou:
+            return self._db.execute(
+                "SELECT date, poids FROM poids WHERE user_id = ? ORDER BY date", (user_id,)
+            ).fetchall()
+
+    def poids_ecrire(self, user_id: str, date_iso: str, poids: float):
+        with self._verrou, self._db:
+            ancien = self._db.execute(
+                "SELECT poids FROM poids WHERE user_id = ? AND date = ?", (user_id, date_iso)
+            ).fetchone()
+            self._poids_upsert([(user_id, date_iso, float(poids))])
+            self._resume_maj(user_id, date_iso, float(poids), ancien[0] if ancien else None)
+            self._ecritures += 1
+        self.miroir.envoyer(("poids", user_id, date_iso, float(poids)))
+
+    def poids_ecrire_lot(self, user_id: str, lignes):
+        # lignes: [(date_iso, poids), ...] ; une transaction, un lot miroir
+        lignes = [(d, float(p)) for d, p in lignes]
+        if not lignes:
+            return
+        with self._verrou, self._db:
+            self._poids_upsert([(user_id, d, p) for d, p in lignes])
+            self._resume_recalculer([user_id])
+            self._ecritures += 1
+        self.miroir.envoyer_lot([("poids", user_id, d, p) for d, p in lignes])
+
+    def _poids_upsert(self, lignes):
+        # lignes: [(user_id, date_iso, poids), ...] ; la ligne Sheet connue est gardée
+        self._db.executemany(
+            """
+            INSERT INTO poids (user_id, date, poids) VALUES (?, ?, ?)
+            ON CONFLICT (user_id, date) DO UPDATE SET poids = excluded.poids
+            """,
+            lignes,
+        )
+
+    def poids_iterer(self, user_id: str, taille=1000):
+        # export : paquets de `taille` lignes triées, sans tout charger
+        # (pagination par clé : le verrou n'est pas gardé entre deux paquets)
+        apres = ""
+        while True:
+            with self._verrou:
+                paquet = self._db.execute(
+                    "SELECT date, poids FROM poids WHERE user_id = ? AND date > ? ORDER BY date LIMIT ?",
+                    (user_id, apres, taille),
+                ).fetchall()
+            if not paquet:
+                return
+            yield paquet
+            apres = paquet[-1][0]
+
+    # ---- RÉSUMÉ (indicateurs) ----
+    def resume_lire(self, user_id: str):
+        # 1 ligne par utilisateur, tenue à jour à chaque poids_ecrire
+        with self._verrou:
+            curseur = self._db.execute("SELECT * FROM resume WHERE user_id = ?", (user_id,))
+            row = curseur.fetchone()
+        if row is None:
+            return None
+        r = dict(zip([c[0] for c in curseur.description], row))
+        r["moyenne_fenetre"] = r["somme_fenetre"] / r["nb_fenetre"]
+        r["fenetre_complete"] = _jour(r["dernier_date"]) - _jour(r["premier_date"]) >= self.jours_resume - 1
+        return r
+
+    def _resume_recalculer(self, users):
+        if not users:
+            return
+        users = list(users)
+        marques = ", ".join("?" * len(users))
+        rows = self._db.execute(
+            f"SELECT user_id, date, poids FROM poids WHERE user_id IN ({marques})", users
+        ).fetchall()
+        self._db.execute(f"DELETE FROM resume WHERE user_id IN ({marques})", users)
+        self._db.executemany(
+            "INSERT INTO resume VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _resumes(rows, self.jours_resume)
+        )
+
+    def _resume_maj(self, user_id, date_iso, poids, ancien):
+        # Mise à jour incrémentale ; seul le remplacement d'un min/max oblige
+        # à relire les extrêmes de l'utilisateur (requête indexée).
+        r = self._db.execute(
+            "SELECT nb, premier_date, premier_poids, dernier_date, dernier_poids, poids_min, poids_max, "
+            "somme_fenetre, nb_fenetre FROM resume WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if r is None:
+            self._db.execute(
+                "INSERT INTO resume VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?, 1)",
+                (user_id, date_iso, poids, date_iso, poids, poids, poids, poids),
+            )
+            return
+        nb, premier_date, premier_poids, dernier_date, dernier_poids, pmin, pmax, somme, nb_f = r
+        if ancien is None:
+            nb += 1
+        if date_iso <= premier_date:
+            premier_date, premier_poids = date_iso, poids
+        if ancien is not None and ancien in (pmin, pmax) and poids != ancien:
+            pmin, pmax = self._db.execute(
+                "SELECT MIN(poids), MAX(poids) FROM poids WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        else:
+            pmin, pmax = min(pmin, poids), max(pmax, poids)
+        if date_iso > dernier_date:
+            # la fenêtre glisse : au plus `jours_resume` lignes relues
+            dernier_date, dernier_poids = date_iso, poids
+            somme, nb_f = self._db.execute(
+                "SELECT SUM(poids), COUNT(*) FROM poids WHERE user_id = ? AND date BETWEEN ? AND ?",
+                (user_id, _date_moins(dernier_date, self.jours_resume - 1), dernier_date),
+            ).fetchone()
+        elif date_iso >= _date_moins(dernier_date, self.jours_resume - 1):
+            if date_iso == dernier_date:
+                dernier_poids = poids
+            somme += poids - (ancien if ancien is not None else 0.0)
+            nb_f += ancien is None
+        self._db.execute(
+            "UPDATE resume SET nb = ?, premier_date = ?, premier_poids = ?, dernier_date = ?, "
+            "dernier_poids = ?, poids_min = ?, poids_max = ?, somme_fenetre = ?, nb_fenetre = ? "
+            "WHERE user_id = ?",
+            (nb, premier_date, premier_poids, dernier_date, dernier_poids, pmin, pmax, somme, nb_f, user_id),
+        )
+
+    # ---- Écriture dans le Sheet (thread du miroir) ----
+    def _appliquer(self, lot):
+        # lot déjà fusionné par le miroir : au plus une op par clé
+        ws_profil, ws_poids = (self.miroir.limiter(ws) for ws in self._feuilles())
+        profils = {op[1]: op[2] for op in lot if op[0] == "profil"}
+        poids = [op[1:] for op in lot if op[0] == "poids"]
+        with self._verrou_sync:
+            if profils:
+                self._profil_pousser(ws_profil, profils)
+            if poids:
+                self._poids_pousser(ws_poids, poids)
+
+    def _verifier(self, index, ws, ligne, cle):
+        # index ancien : on vérifie que la ligne est toujours la bonne
+        if not index.a_verifier():
+            return ligne
+        plage = f"A{ligne}:{chr(64 + len(cle))}{ligne}"
+        if [list(r[:len(cle)]) for r in ws.get(plage)] == [list(cle)]:
+            index.verifie_a = time.monotonic()
+            return ligne
+        index.reconstruire(ws.get_all_values())
+        return index.ligne(*cle)
+
+    def _poids_pousser(self, ws_poids, lot):
+        # lot: [(user_id, date_iso, poids), ...] -> 1 batch_update pour les
+        # lignes connues + 1 append_rows pour les nouvelles
+        index = self.index_poids
+        if index.nb_lignes == 0:
+            ws_poids.append_row(POIDS_ENTETES)
+            index._fixer_nb_lignes(1)
+
+        maj, ajouts = [], []
+        for user_id, date_iso, poids in lot:
+            cle = (user_id, date_iso)
+            valeurs = [user_id, date_iso, str(poids)]
+            ligne = index.ligne(*cle)
+            if ligne is not None:
+                ligne = self._verifier(index, ws_poids, ligne, cle)
+            if ligne is None:
+                ajouts.append((cle, valeurs))
+            else:
+                maj.append({"range": f"A{ligne}:C{ligne}", "values": [valeurs]})
+        if maj:
+            ws_poids.batch_update(maj)
+        if ajouts:
+            reponse = ws_poids.append_rows([v for _, v in ajouts])
+            index.apres_ajout(ws_poids, [c for c, _ in ajouts], reponse)
+
+    def _profil_pousser(self, ws_profil, lot):
+        # lot: {user_id: valeurs modifiées}. Jamais de clear() : cellules
+        # modifiées en 1 batch_update, nouveaux utilisateurs en 1 append_rows.
+        index = self.index_profil
+        maj = []
+        if index.nb_lignes == 0:
+            ws_profil.append_row(self._profil_entetes)
+            index._fixer_nb_lignes(1)
+        # copie : si le lot échoue, l'en-tête sera réécrit à la tentative suivante
+        entetes = list(self._profil_entetes)
+        if any(k not in entetes for data in lot.values() for k in data):
+            # en-tête relu avant d'y placer une colonne : une autre instance
+            # a pu en ajouter depuis notre dernière lecture
+            lue = ws_profil.get(f"A1:{PROFIL_DERNIERE_COLONNE}1")
+            if lue and lue[0]:
+                entetes = [c.strip() for c in lue[0]]
+        for data in lot.values():
+            for k in data:
+                if k not in entetes:
+                    # nouvelle colonne (clé ajoutée au schéma)
+                    entetes.append(k)
+                    maj.append({"range": f"{_colonne(len(entetes))}1", "values": [[k]]})
+
+        nouveaux = []
+        for user_id, data in lot.items():
+            ligne = index.ligne(user_id)
+            if ligne is not None:
+                ligne = self._verifier(index, ws_profil, ligne, (user_id,))
+            if ligne is None:
+                nouveaux.append(user_id)
+                continue
+            for k, v in data.items():
+                col = _colonne(entetes.index(k) + 1)
+                maj.append({"range": f"{col}{ligne}", "values": [[str(v)]]})
+        if maj:
+            ws_profil.batch_update(maj)
+        self._profil_entetes = entetes
+        if nouveaux:
+            lignes = []
+            for user_id in nouveaux:
+                complet = self.profil_lire(user_id)
+                lignes.append([user_id] + ["" if complet.get(k) is None else str(complet[k])
+                                           for k in self._profil_entetes[1:]])
+            index.apres_ajout(ws_profil, [(u,) for u in nouveaux], ws_profil.append_rows(lignes))
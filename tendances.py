@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# =========================
+# Moyennes glissantes vectorisées (NumPy)
+# =========================
+def moyenne_glissante(values, window=7):
+    # Même résultat que l'ancienne boucle : moyenne des `window` derniers
+    # points (moins au début de la série), via une somme cumulée.
+    x = np.asarray(values, dtype=float)
+    cs = np.concatenate(([0.0], np.cumsum(x)))
+    fin = np.arange(1, len(x) + 1)
+    debut = np.maximum(0, fin - window)
+    return (cs[fin] - cs[debut]) / (fin - debut)
+
+
+def _jours(dates):
+    # dates ISO / datetime -> nombre de jours (int64)
+    dates = np.asarray(dates)
+    if dates.dtype.kind != "M":
+        dates = pd.to_datetime(dates).to_numpy()
+    return dates.astype("datetime64[D]").astype(np.int64)
+
+
+# =========================
+# Courbes du suivi (axe calendaire)
+# =========================
+def courbes_suivi(dates, poids, jours=7):
+    # dates, poids d'un utilisateur (ex. Historique.jours / .poids)
+    # -> semaine | poids | serie, prêt à tracer.
+    # La moyenne porte sur les `jours` derniers jours calendaires : la série
+    # est ramenée au jour, les trous interpolés dans le temps, puis lissée.
+    if len(dates) == 0:
+        return pd.DataFrame(columns=["semaine", "poids", "serie"])
+    dates = np.asarray(dates)
+    if dates.dtype.kind != "M":
+        dates = pd.to_datetime(dates).to_numpy()
+    serie = pd.Series(np.asarray(poids, dtype=float), index=dates)
+    if not (serie.index.is_monotonic_increasing and serie.index.is_unique):
+        serie = serie.groupby(level=0).mean()  # trié, une valeur par jour
+    t0 = serie.index[0]
+
+    quotidien = serie.resample("D").mean().interpolate(method="time")
+    moyenne = quotidien.rolling(f"{jours}D", min_periods=1).mean()
+
+    reel = pd.DataFrame({
+        "semaine": (serie.index - t0).days.to_numpy() / 7.0,
+        "poids": serie.to_numpy(),
+        "serie": "Réel",
+    })
+    lisse = pd.DataFrame({
+        "semaine": (moyenne.index - t0).days.to_numpy() / 7.0,
+        "poids": moyenne.to_numpy(),
+        "serie": f"Moyenne {jours} jours",
+    })
+    return pd.concat([reel, lisse], ignore_index=True)
+
+
+# =========================
+# Toutes les tendances, tous les utilisateurs, en une passe
+# =========================
+def tendances(df, fenetres=(7,), spans=(7,), jours=(7,), groupe="user_id"):
+    """Ajoute à df (colonnes date, poids et éventuellement user_id) :
+
+    - ma{w}   : moyenne des w dernières mesures, pour chaque w de `fenetres`
+    - ewma{s} : moyenne exponentielle (span s), pour chaque s de `spans`
+    - moy_{j}j: moyenne des mesures des j derniers jours calendaires
+
+    Chaque utilisateur est traité séparément ; le résultat est trié par
+    (user_id, date). Tout est vectorisé sur l'ensemble des lignes.
+    """
+    n = len(df)
+    jour = _jours(df["date"])
+    if groupe in df.columns:
+        gid, _ = pd.factorize(df[groupe], sort=True)
+    else:
+        gid = np.zeros(n, dtype=np.int64)
+    cle = gid.astype(np.int64) * (1 << 32) + (jour - (jour.min() if n else 0))
+    if n and np.any(cle[1:] < cle[:-1]):
+        ordre = np.argsort(cle, kind="stable")
+        out = df.iloc[ordre].reset_index(drop=True)
+        gid, cle = gid[ordre], cle[ordre]
+    else:
+        out = df.reset_index(drop=True)
+    if n == 0:
+        for nom in [f"ma{w}" for w in fenetres] + [f"ewma{s}" for s in spans] + [f"moy_{j}j" for j in jours]:
+            out[nom] = pd.Series(dtype=float)
+        return out
+    x = out["poids"].to_numpy(dtype=float)
+
+    # début de groupe pour chaque ligne
+    nouveau = np.ones(n, dtype=bool)
+    nouveau[1:] = gid[1:] != gid[:-1]
+    debuts = np.flatnonzero(nouveau)
+    longueurs = np.diff(np.append(debuts, n))
+    debut_ligne = np.repeat(debuts, longueurs)
+
+    cs = np.concatenate(([0.0], np.cumsum(x)))
+    fin = np.arange(1, n + 1)
+
+    for w in fenetres:
+        debut = np.maximum(debut_ligne, fin - w)
+        out[f"ma{w}"] = (cs[fin] - cs[debut]) / (fin - debut)
+
+    # fenêtre calendaire : recherche binaire sur (groupe, jour)
+    for j in jours:
+        debut = np.searchsorted(cle, cle - (j - 1), side="left")
+        out[f"moy_{j}j"] = (cs[fin] - cs[debut]) / (fin - debut)
+
+    # EWMA (adjust=True comme pandas) : récurrence sur la position dans le
+    # groupe, vectorisée sur tous les utilisateurs à chaque pas.
+    par_longueur = np.argsort(-longueurs, kind="stable")
+    debuts_tries = debuts[par_longueur]
+    longueurs_triees = longueurs[par_longueur]
+    for s in spans:
+        a = 2.0 / (s + 1.0)
+        num = np.empty(n)
+        den = np.empty(n)
+        num[debuts] = x[debuts]
+        den[debuts] = 1.0
+        for p in range(1, int(longueurs.max())):
+            # groupes encore actifs au pas p (triés par longueur décroissante)
+            actifs = np.searchsorted(-longueurs_triees, -p, side="left")
+            idx = debuts_tries[:actifs] + p
+            num[idx] = x[idx] + (1 - a) * num[idx - 1]
+            den[idx] = 1.0 + (1 - a) * den[idx - 1]
+        out[f"ewma{s}"] = num / den
+
+    return out
@@ -0,0 +1,143 @@
+"""Mode hors ligne : Journal et StockageLocal.ouvrir (faux Sheet en mémoire)."""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stockage import FeuilleMemoire, Journal, MiroirFeuilles, StockageLocal  # noqa: E402
+
+APPELS = {"get", "batch_get", "get_all_values", "append_row", "append_rows", "update", "batch_update"}
+
+
+class Reseau:
+    en_panne = False
+
+
+class FeuilleEnPanne(FeuilleMemoire):
+    """Chaque appel au "Sheet" échoue tant que son réseau est en panne."""
+
+    def __init__(self, lignes, titre, reseau):
+        super().__init__(lignes, titre)
+        self.reseau = reseau
+
+    def __getattribute__(self, nom):
+        if nom in APPELS and object.__getattribute__(self, "reseau").en_panne:
+            raise ConnectionError("503 Service Unavailable")
+        return super().__getattribute__(nom)
+
+
+@pytest.fixture(autouse=True)
+def miroir_rapide(monkeypatch):
+    monkeypatch.setattr(MiroirFeuilles, "fenetre", 0.01)
+    monkeypatch.setattr(MiroirFeuilles, "delai_retry", 0.01)
+    monkeypatch.setattr(MiroirFeuilles, "delai_max", 0.05)
+    monkeypatch.setattr(MiroirFeuilles, "tentatives_max", 2)
+
+
+@pytest.fixture
+def sheet():
+    # contenu du Sheet, partagé par les process successifs
+    return {
+        "profil": [["user_id", "poids_actuel"], ["a", "80"]],
+        "poids": [["user_id", "date", "poids"], ["a", "2026-01-01", "80"]],
+    }
+
+
+def demarrer(sheet, dossier, reseau):
+    # un "process" : ses feuilles voient le même contenu, à travers son réseau
+    feuilles = {}
+    for nom, lignes in sheet.items():
+        feuilles[nom] = FeuilleEnPanne([], nom, reseau)
+        feuilles[nom].lignes = lignes
+    stockage = StockageLocal(
+        lambda: (feuilles["profil"], feuilles["poids"]),
+        chemin=str(dossier / "copie.sqlite3"), journal=str(dossier / "ecritures.journal"),
+    )
+    stockage.ouvrir()
+    return stockage
+
+
+def poids_sheet(sheet):
+    return [tuple(r) for r in sheet["poids"][1:]]
+
+
+def test_ecritures_pendant_une_panne(sheet, tmp_path):
+    reseau = Reseau()
+    stockage = demarrer(sheet, tmp_path, reseau)
+    reseau.en_panne = True
+    stockage.poids_ecrire("a", "2026-01-02", 79.5)
+    stockage.profil_ecrire("a", {"objectif": 70})
+
+    assert not stockage.miroir.attendre(0.3)
+    assert stockage.miroir.etat("a") == "hors_ligne"
+    assert stockage.poids_lire("a") == [("2026-01-01", 80.0), ("2026-01-02", 79.5)]
+    assert stockage.miroir.journal.en_attente() == 2
+
+    reseau.en_panne = False
+    assert stockage.miroir.attendre(5)
+    assert stockage.miroir.etat("a") == "ok"
+    assert stockage.miroir.journal.en_attente() == 0
+    assert poids_sheet(sheet) == [("a", "2026-01-01", "80"), ("a", "2026-01-02", "79.5")]
+    assert sheet["profil"][1][sheet["profil"][0].index("objectif")] == "70.0"
+
+
+def test_redemarrage_hors_ligne(sheet, tmp_path):
+    # premier process : écrit pendant la panne puis s'arrête (sa panne ne finit jamais)
+    reseau_premier = Reseau()
+    premier = demarrer(sheet, tmp_path, reseau_premier)
+    reseau_premier.en_panne = True
+    premier.poids_ecrire("a", "2026-01-02", 79.5)
+    premier.poids_ecrire("a", "2026-01-01", 80.5)
+
+    # second process, Sheet toujours injoignable : copie locale + journal
+    reseau = Reseau()
+    reseau.en_panne = True
+    second = demarrer(sheet, tmp_path, reseau)
+    assert second.poids_lire("a") == [("2026-01-01", 80.5), ("2026-01-02", 79.5)]
+    assert second.miroir.etat("a") in ("en_attente", "hors_ligne")
+
+    reseau.en_panne = False
+    assert second.miroir.attendre(5)
+    assert poids_sheet(sheet) == [("a", "2026-01-01", "80.5"), ("a", "2026-01-02", "79.5")]
+    assert Journal(str(tmp_path / "ecritures.journal")).a_rejouer() == []
+
+
+def test_journal_tronque(tmp_path):
+    chemin = str(tmp_path / "ecritures.journal")
+    journal = Journal(chemin)
+    journal.ajouter([("poids", "a", "2026-01-02", 79.5), ("poids", "a", "2026-01-03", 79.0)])
+    journal._f.close()
+    # arrêt pendant l'écriture de la troisième op
+    with open(chemin, "a", encoding="utf-8") as f:
+        f.write('{"n": 3, "op": ["poids", "a", "2026-01-0')
+
+    relu = Journal(chemin)
+    assert relu.a_rejouer() == [("poids", "a", "2026-01-02", 79.5), ("poids", "a", "2026-01-03", 79.0)]
+    relu.ajouter([("poids", "a", "2026-01-04", 78.5)])
+    relu._f.close()
+
+    with open(chemin, encoding="utf-8") as f:
+        lignes = [json.loads(ligne) for ligne in f]
+    assert [e["n"] for e in lignes] == [1, 2, 3]
+    assert Journal(chemin).a_rejouer()[-1] == ("poids", "a", "2026-01-04", 78.5)
+
+
+def test_double_rejeu(sheet, tmp_path):
+    # ops recopiées dans le Sheet, mais arrêt avant leur acquittement
+    journal = Journal(str(tmp_path / "ecritures.journal"))
+    journal.ajouter([("poids", "a", "2026-01-02", 79.5), ("profil", "a", {"objectif": 70.0})])
+    journal._f.close()
+    sheet["poids"].append(["a", "2026-01-02", "79.5"])
+
+    for _ in range(2):
+        stockage = demarrer(sheet, tmp_path, Reseau())
+        assert stockage.miroir.attendre(5)
+        stockage.miroir.journal._f.close()
+
+    assert poids_sheet(sheet) == [("a", "2026-01-01", "80"), ("a", "2026-01-02", "79.5")]
+    assert [r[0] for r in sheet["profil"][1:]] == ["a"]
+    assert stockage.profil_lire("a")["objectif"] == 70.0
+    assert Journal(str(tmp_path / "ecritures.journal")).a_rejouer() == []
@@ -0,0 +1,77 @@
+"""Deux process sur le même Sheet : StockageLocal.synchroniser / reconstruire."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stockage import FeuilleMemoire, MiroirFeuilles, StockageLocal  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def miroir_rapide(monkeypatch):
+    monkeypatch.setattr(MiroirFeuilles, "fenetre", 0.01)
+
+
+@pytest.fixture
+def sheet():
+    return {
+        "profil": [["user_id", "poids_actuel"], ["a", "80"]],
+        "poids": [["user_id", "date", "poids"], ["a", "2026-01-01", "80"]],
+    }
+
+
+def demarrer(sheet):
+    # un "process" : ses propres feuilles, le même contenu
+    feuilles = {}
+    for nom, lignes in sheet.items():
+        feuilles[nom] = FeuilleMemoire([], nom)
+        feuilles[nom].lignes = lignes
+    stockage = StockageLocal(lambda: (feuilles["profil"], feuilles["poids"]))
+    stockage.ouvrir()
+    return stockage
+
+
+def test_lignes_des_autres_process(sheet):
+    a, b = demarrer(sheet), demarrer(sheet)
+    a.poids_ecrire("x", "2026-01-02", 70.0)
+    assert a.miroir.attendre(5)
+    # l'ajout de b atterrit une ligne plus bas que prévu : index reconstruit
+    b.poids_ecrire("y", "2026-01-02", 60.0)
+    assert b.miroir.attendre(5)
+
+    b.synchroniser(force=True)
+    assert b.poids_lire("x") == [("2026-01-02", 70.0)]
+    assert b.resume_lire("x")["nb"] == 1
+
+    b.poids_ecrire("x", "2026-01-02", 69.5)
+    assert b.miroir.attendre(5)
+    assert [r for r in sheet["poids"] if r[0] == "x"] == [["x", "2026-01-02", "69.5"]]
+
+
+def test_cellule_modifiee_a_la_main(sheet):
+    b = demarrer(sheet)
+    sheet["poids"][1][2] = "81"
+    assert b.synchroniser(force=True) is None
+    assert b.poids_lire("a") == [("2026-01-01", 81.0)]
+    assert b.synchroniser(force=True) == set()
+
+
+def test_colonnes_ajoutees_par_deux_process(sheet):
+    a, b = demarrer(sheet), demarrer(sheet)
+    a.profil_ecrire("a", {"sexe": "F"})
+    assert a.miroir.attendre(5)
+    b.profil_ecrire("a", {"age": 40})
+    assert b.miroir.attendre(5)
+
+    entetes = sheet["profil"][0]
+    assert entetes == ["user_id", "poids_actuel", "sexe", "age"]
+    assert sheet["profil"][1] == ["a", "80", "F", "40"]
+    b.profil_ecrire("a", {"poids_actuel": 79})
+    assert b.miroir.attendre(5)
+    a.profil_ecrire("c", {"sexe": "H"})
+    assert a.miroir.attendre(5)
+    assert b.synchroniser(force=True) == {"c"}
+    assert b.profil_lire("c")["sexe"] == "H"
+    assert sheet["profil"][1] == ["a", "79.0", "F", "40"]
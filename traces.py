@@ -0,0 +1,245 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# bornes des histogrammes de latence (secondes), comme Prometheus
+BORNES = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# =========================
+# Registre de mesures (un par process)
+# =========================
+class Histogramme:
+    __slots__ = ("compte", "somme", "seaux")
+
+    def __init__(self):
+        self.compte = 0
+        self.somme = 0.0
+        self.seaux = [0] * (len(BORNES) + 1)  # dernier seau : +Inf
+
+    def observer(self, secondes):
+        self.compte += 1
+        self.somme += secondes
+        for i, borne in enumerate(BORNES):
+            if secondes <= borne:
+                self.seaux[i] += 1
+                return
+        self.seaux[-1] += 1
+
+    def quantile(self, q):
+        # borne supérieure du seau qui contient le quantile q
+        if not self.compte:
+            return 0.0
+        cumul = 0
+        for i, n in enumerate(self.seaux):
+            cumul += n
+            if cumul >= q * self.compte:
+                return BORNES[i] if i < len(BORNES) else float("inf")
+        return float("inf")
+
+
+class Registre:
+    """Latences (histogrammes) et compteurs, étiquetés comme en Prometheus.
+
+    Les sources (ex. CacheUtilisateurs.stats, miroir.metriques) sont lues au
+    moment de l'export : rien à faire sur le chemin chaud.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.latences = defaultdict(Histogramme)   # (nom, étiquettes) -> Histogramme
+        self.compteurs = defaultdict(float)        # (nom, étiquettes) -> valeur
+        self.sources = {}                          # nom -> fonction() -> dict
+
+    def observer(self, nom, secondes, **etiquettes):
+        with self._verrou:
+            self.latences[(nom, tuple(sorted(etiquettes.items())))].observer(secondes)
+
+    def incrementer(self, nom, valeur=1, **etiquettes):
+        with self._verrou:
+            self.compteurs[(nom, tuple(sorted(etiquettes.items())))] += valeur
+
+    def instantane(self) -> dict:
+        with self._verrou:
+            latences = [
+                {"nom": nom, **dict(etiq), "compte": h.compte, "somme_s": h.somme,
+                 "p50_s": h.quantile(0.5), "p95_s": h.quantile(0.95), "seaux": list(h.seaux)}
+                for (nom, etiq), h in sorted(self.latences.items())
+            ]
+            compteurs = [{"nom": nom, **dict(etiq), "valeur": v} for (nom, etiq), v in sorted(self.compteurs.items())]
+        sources = {}
+        for nom, fonction in list(self.sources.items()):
+            try:
+                sources[nom] = fonction()
+            except Exception as e:  # une source cassée ne bloque pas l'export
+                sources[nom] = {"erreur": repr(e)}
+        return {"horodatage": time.time(), "bornes_s": list(BORNES), "latences": latences,
+                "compteurs": compteurs, "sources": sources}
+
+    def json(self) -> str:
+        return json.dumps(self.instantane(), indent=2, ensure_ascii=False, default=str)
+
+    def prometheus(self) -> str:
+        # format texte d'exposition Prometheus (textfile collector, /metrics)
+        inst = self.instantane()
+        lignes, types = [], set()
+        for h in inst["latences"]:
+            nom = "perte_poids_" + _nom(h["nom"]) + "_secondes"
+            if nom not in types:
+                types.add(nom)
+                lignes.append(f"# TYPE {nom} histogram")
+            etiq = {k: v for k, v in h.items() if k not in ("nom", "compte", "somme_s", "p50_s", "p95_s", "seaux")}
+            cumul = 0
+            for borne, n in zip([*BORNES, "+Inf"], h["seaux"]):
+                cumul += n
+                lignes.append(f"{nom}_bucket{_etiquettes({**etiq, 'le': borne})} {cumul}")
+            lignes.append(f"{nom}_sum{_etiquettes(etiq)} {h['somme_s']}")
+            lignes.append(f"{nom}_count{_etiquettes(etiq)} {h['compte']}")
+        for c in inst["compteurs"]:
+            etiq = {k: v for k, v in c.items() if k not in ("nom", "valeur")}
+            lignes.append(f"perte_poids_{_nom(c['nom'])}{_etiquettes(etiq)} {c['valeur']}")
+        for source, valeurs in inst["sources"].items():
+            for k, v in valeurs.items():
+                if isinstance(v, (int, float)):
+                    lignes.append(f"perte_poids_{_nom(source)}_{_nom(k)} {v}")
+        return "\n".join(lignes) + "\n"
+
+
+def _nom(s):
+    return "".join(c if c.isalnum() else "_" for c in str(s)).lower()
+
+
+def _etiquettes(etiq):
+    if not etiq:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in etiq.items()) + "}"
+
+
+REGISTRE = Registre()
+
+
+# =========================
+# Points de mesure
+# =========================
+@contextmanager
+def mesurer(nom, **etiquettes):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRE.observer(nom, time.perf_counter() - t0, **etiquettes)
+
+
+def tracer(nom):
+    # décorateur : latence de chaque appel de la fonction
+    def deco(fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            with mesurer(nom):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return deco
+
+
+def cache_appel(nom):
+    # à appeler à chaque lecture d'un cache ; cache_manque seulement quand
+    # la valeur est recalculée (corps d'une fonction st.cache_data)
+    REGISTRE.incrementer("cache_total", fonction=nom, resultat="appel")
+
+
+def cache_manque(nom):
+    REGISTRE.incrementer("cache_total", fonction=nom, resultat="manque")
+
+
+def _taille(valeur):
+    # octets transférés, estimés sur les cellules (lignes de chaînes)
+    if isinstance(valeur, str):
+        return len(valeur.encode("utf-8"))
+    if isinstance(valeur, (list, tuple)):
+        return sum(_taille(v) for v in valeur)
+    if isinstance(valeur, dict):
+        return sum(_taille(v) for v in valeur.values())
+    return 0
+
+
+class FeuilleTracee:
+    """Enveloppe un gspread.Worksheet : latence, octets et lignes lues par appel."""
+
+    APPELS = {"get", "batch_get", "get_all_values", "append_row", "append_rows", "update", "batch_update", "clear"}
+
+    def __init__(self, ws):
+        self._ws = ws
+
+    def __getattr__(self, nom):
+        attr = getattr(self._ws, nom)
+        if nom not in self.APPELS:
+            return attr
+
+        def appel(*args, **kwargs):
+            feuille = getattr(self._ws, "title", "")
+            with mesurer("sheets", methode=nom, feuille=feuille):
+                resultat = attr(*args, **kwargs)
+            REGISTRE.incrementer("sheets_appels_total", methode=nom, feuille=feuille)
+            if nom in ("get", "batch_get", "get_all_values"):
+                lignes = sum(len(r) for r in resultat) if nom == "batch_get" else len(resultat)
+                REGISTRE.incrementer("sheets_lignes_lues_total", lignes, feuille=feuille)
+                REGISTRE.incrementer("sheets_octets_recus_total", _taille(resultat), feuille=feuille)
+            else:
+                REGISTRE.incrementer("sheets_octets_envoyes_total", _taille([args, kwargs]), feuille=feuille)
+            return resultat
+        return appel
+
+
+# =========================
+# Exports : fichier local (Prometheus / JSON) et page d'admin
+# =========================
+def ecrire(chemin):
+    contenu = REGISTRE.json() if chemin.endswith(".json") else REGISTRE.prometheus()
+    temporaire = chemin + ".tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        f.write(contenu)
+    os.replace(temporaire, chemin)
+
+
+def demarrer_export(chemin, periode=60.0):
+    # réécrit le fichier toutes les `periode` s (textfile collector de node_exporter)
+    def boucle():
+        while True:
+            time.sleep(periode)
+            try:
+                ecrire(chemin)
+            except OSError:
+                pass
+
+    threading.Thread(target=boucle, name="export-traces", daemon=True).start()
+
+
+def page_admin():
+    import pandas as pd
+    import streamlit as st
+
+    inst = REGISTRE.instantane()
+    st.title("🔧 Traces")
+    st.caption("Mesures du process depuis son démarrage (toutes sessions).")
+
+    st.markdown("### ⏱️ Latences")
+    if inst["latences"]:
+        df = pd.DataFrame(inst["latences"]).drop(columns=["seaux"])
+        df["moyenne_ms"] = 1000 * df["somme_s"] / df["compte"].clip(lower=1)
+        st.dataframe(df.sort_values("somme_s", ascending=False), use_container_width=True)
+
+    st.markdown("### 🔢 Compteurs")
+    if inst["compteurs"]:
+        st.dataframe(pd.DataFrame(inst["compteurs"]), use_container_width=True)
+
+    st.markdown("### 🗄️ Caches et miroir")
+    for nom, valeurs in inst["sources"].items():
+        st.write(f"**{nom}**", valeurs)
+
+    c1, c2 = st.columns(2)
+    c1.download_button("Export Prometheus", REGISTRE.prometheus(), "perte_poids.prom", "text/plain")
+    c2.download_button("Export JSON", REGISTRE.json(), "perte_poids.json", "application/json")